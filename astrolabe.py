@@ -25,10 +25,12 @@ Additionally, we use LaTeX to build a summary document for each latitude, which
 to build an astrolabe for that latitude, and instructions as to how to put them together.
 """
 
+import hashlib
 import os
+import shutil
 import subprocess
-import time
-from typing import Dict, Union
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
 
 import text
 from climate import Climate
@@ -39,112 +41,241 @@ from rete import Rete
 from rule import Rule
 from settings import fetch_command_line_arguments
 
-# Create clean output directory
-os.system("rm -Rf output")
-os.system("mkdir -p output/astrolabes output/astrolabe_parts")
-
-arguments: Dict[str, Union[int, str]] = fetch_command_line_arguments()
-theme: str = arguments['theme']
-
-# Render astrolabe in all available languages
-language: str
-for language in text.text:
-
-    # Render simplified and full astrolabes
-    astrolabe_type: str
-    for astrolabe_type in ["full", "simplified"]:
-
-        # Render climates for latitudes at 5-degree spacings from 10 deg -- 85 deg, plus 52N
-        latitude: float
-        for latitude in list(range(-80, 90, 5)) + [52]:
-
-            # Do not make equatorial astrolabes, as they don't really work
-            if -10 < latitude < 10:
-                continue
-
-            # Boolean flag for which hemisphere we're in
-            southern: bool = latitude < 0
-
-            # A dictionary of common substitutions
-            subs: Dict[str, Union[str, float]] = {
-                "dir_parts": "output/astrolabe_parts",
-                "dir_out": "output/astrolabes",
-                "abs_lat": abs(latitude),
-                "ns": "S" if southern else "N",
-                "astrolabe_type": astrolabe_type,
-                "lang": language,
-                "lang_short": "" if language == "en" else "_{}".format(language)
-            }
-
-            settings: Dict[str, Union[str, float]] = {
-                'language': language,
-                "astrolabe_type": astrolabe_type,
-                'latitude': latitude,
-                'theme': theme
-            }
-
-            # Render the parts of the astrolabe that do not change with geographic location
-            MotherFront(settings=settings).render_all_formats(
-                filename="{dir_parts}/mother_front_{abs_lat:02d}{ns}_{lang}_{astrolabe_type}".format(**subs)
-            )
 
-            MotherBack(settings=settings).render_all_formats(
-                filename="{dir_parts}/mother_back_{abs_lat:02d}{ns}_{lang}_{astrolabe_type}".format(**subs)
-            )
+def build_latex_format() -> None:
+    """
+    Precompile the preamble of <doc/astrolabe.tex> into a LaTeX format file, <doc/astrolabe_format.fmt>.
 
-            Rete(settings=settings).render_all_formats(
-                filename="{dir_parts}/rete_{abs_lat:02d}{ns}_{lang}_{astrolabe_type}".format(**subs)
-            )
+    Every pdflatex invocation otherwise re-reads and re-executes the whole preamble -- graphicx, fancyhdr,
+    hyperref and friends -- before typesetting a handful of pages. Dumping the preamble into a format file
+    once, using mylatexformat, lets the per-astrolabe runs skip that work. If the format cannot be built
+    (e.g. mylatexformat is not installed), we simply leave the file absent and the workers fall back to
+    running pdflatex normally.
 
-            Rule(settings=settings).render_all_formats(
-                filename="{dir_parts}/rule_{abs_lat:02d}{ns}_{lang}_{astrolabe_type}".format(**subs)
-            )
+    :return:
+        None
+    """
+
+    subprocess.run(["pdftex", "-ini", "-interaction=nonstopmode", "-halt-on-error",
+                    "-jobname=astrolabe_format", "&pdflatex", "mylatexformat.ltx", "astrolabe.tex"],
+                   cwd="doc", stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def render_shared_parts(language: str, astrolabe_type: str, hemisphere: str, theme: str) -> None:
+    """
+    Render the parts of the astrolabe that do not change with geographic location.
+
+    The mother, rete and rule depend only on the language, the astrolabe type, the color theme, and which
+    hemisphere we're in -- not on the exact latitude. We therefore render them once per hemisphere, and
+    <render_one> copies the cached image files into the per-latitude filenames.
+
+    :param language:
+        The language in which to render the text labels on this astrolabe
+    :param astrolabe_type:
+        The type of astrolabe to render -- either "full" or "simplified"
+    :param hemisphere:
+        The hemisphere we're in -- either "N" or "S"
+    :param theme:
+        The color theme to use when rendering this astrolabe
+    :return:
+        None
+    """
+
+    # A representative latitude for this hemisphere; only its sign affects these components
+    latitude: float = 52 if hemisphere == "N" else -52
+
+    # A dictionary of common substitutions
+    subs: Dict[str, Union[str, float]] = {
+        "dir_parts": "output/astrolabe_parts",
+        "ns": hemisphere,
+        "astrolabe_type": astrolabe_type,
+        "lang": language
+    }
+
+    settings: Dict[str, Union[str, float]] = {
+        'language': language,
+        "astrolabe_type": astrolabe_type,
+        'latitude': latitude,
+        'theme': theme
+    }
+
+    MotherFront(settings=settings).render_all_formats(
+        filename="{dir_parts}/mother_front_{ns}_{lang}_{astrolabe_type}".format(**subs)
+    )
+
+    MotherBack(settings=settings).render_all_formats(
+        filename="{dir_parts}/mother_back_{ns}_{lang}_{astrolabe_type}".format(**subs)
+    )
+
+    Rete(settings=settings).render_all_formats(
+        filename="{dir_parts}/rete_{ns}_{lang}_{astrolabe_type}".format(**subs)
+    )
+
+    Rule(settings=settings).render_all_formats(
+        filename="{dir_parts}/rule_{ns}_{lang}_{astrolabe_type}".format(**subs)
+    )
+
+
+def render_one(language: str, astrolabe_type: str, latitude: float, theme: str) -> None:
+    """
+    Render all the parts of a single astrolabe, in a single language, for a single latitude, and build a LaTeX
+    summary document containing all of them.
+
+    Each (language, latitude) rendering is completely independent and writes to distinct output filenames, so
+    many instances of this function may safely run in parallel in separate processes. Each worker process is
+    given its own LaTeX working directory, so that concurrent pdflatex runs do not collide.
 
-            # Render the climate of the astrolabe
-            Climate(settings=settings).render_all_formats(
-                filename="{dir_parts}/climate_{abs_lat:02d}{ns}_{lang}_{astrolabe_type}".format(**subs)
+    :param language:
+        The language in which to render the text labels on this astrolabe
+    :param astrolabe_type:
+        The type of astrolabe to render -- either "full" or "simplified"
+    :param latitude:
+        The latitude to render this astrolabe for
+    :param theme:
+        The color theme to use when rendering this astrolabe
+    :return:
+        None
+    """
+
+    # Boolean flag for which hemisphere we're in
+    southern: bool = latitude < 0
+
+    # Each worker process gets a private LaTeX working directory, so that parallel pdflatex runs don't collide
+    dir_doc: str = "doc/tmp_{:d}".format(os.getpid())
+
+    # A dictionary of common substitutions
+    subs: Dict[str, Union[str, float]] = {
+        "dir_parts": "output/astrolabe_parts",
+        "dir_out": "output/astrolabes",
+        "dir_doc": dir_doc,
+        "abs_lat": abs(latitude),
+        "ns": "S" if southern else "N",
+        "astrolabe_type": astrolabe_type,
+        "lang": language,
+        "lang_short": "" if language == "en" else "_{}".format(language)
+    }
+
+    settings: Dict[str, Union[str, float]] = {
+        'language': language,
+        "astrolabe_type": astrolabe_type,
+        'latitude': latitude,
+        'theme': theme
+    }
+
+    # The parts of the astrolabe that do not change with geographic location were rendered once per
+    # hemisphere by <render_shared_parts>; copy the cached image files into the per-latitude filenames
+    for part in ("mother_front", "mother_back", "rete", "rule"):
+        for img_format in GraphicsPage.supported_formats():
+            shutil.copyfile(
+                "{dir_parts}/{part}_{ns}_{lang}_{astrolabe_type}.{img_format}".format(
+                    part=part, img_format=img_format, **subs),
+                "{dir_parts}/{part}_{abs_lat:02d}{ns}_{lang}_{astrolabe_type}.{img_format}".format(
+                    part=part, img_format=img_format, **subs)
             )
 
-            # Make combined mother and climate
-            for img_format in GraphicsPage.supported_formats():
-                CompositeComponent(
-                    settings=settings,
-                    components=[
-                        MotherFront(settings=settings),
-                        Climate(settings=settings)
-                    ]
-                ).render_all_formats(
-                    filename="{dir_parts}/mother_front_combi_{abs_lat:02d}{ns}_{lang}_{astrolabe_type}".format(**subs)
-                )
-
-            # Copy the PDF versions of the components of this astrolabe into LaTeX's working directory, to produce a
-            # PDF file containing all the parts of this astrolabe
-            os.system("mkdir -p doc/tmp")
-            os.system("cp {dir_parts}/mother_back_{abs_lat:02d}{ns}_{lang}_{astrolabe_type}.pdf "
-                      "   doc/tmp/mother_back.pdf".format(**subs))
-            os.system("cp {dir_parts}/mother_front_combi_{abs_lat:02d}{ns}_{lang}_{astrolabe_type}.pdf "
-                      "   doc/tmp/mother_front.pdf".format(**subs))
-            os.system("cp {dir_parts}/rete_{abs_lat:02d}{ns}_{lang}_{astrolabe_type}.pdf "
-                      "   doc/tmp/rete.pdf".format(**subs))
-            os.system("cp {dir_parts}/rule_{abs_lat:02d}{ns}_{lang}_{astrolabe_type}.pdf "
-                      "   doc/tmp/rule.pdf".format(**subs))
-
-            with open("doc/tmp/lat.tex", "wt") as f:
-                f.write(r"${abs_lat:d}^\circ${ns}".format(**subs))
-
-            # Wait for cairo to wake up and close the files
-            time.sleep(1)
-
-            # Build LaTeX documentation
-            for build_pass in range(3):
-                subprocess.check_output("cd doc ; pdflatex astrolabe.tex", shell=True)
-            os.system("mv doc/astrolabe.pdf "
-                      "   {dir_out}/astrolabe_{abs_lat:02d}{ns}_{lang}_{astrolabe_type}.pdf".format(**subs))
-
-            # For the English language astrolabe, create a symlink with no language suffix in the filename
-            if language == "en" and astrolabe_type == "full":
-                os.system("ln -s astrolabe_{abs_lat:02d}{ns}_en_full.pdf "
-                          "{dir_out}/astrolabe_{abs_lat:02d}{ns}.pdf".format(**subs))
-
-            # Clean up the rubbish that LaTeX leaves behind
-            os.system("cd doc ; rm -f *.aux *.log *.dvi *.ps *.pdf")
+    # Render the climate of the astrolabe
+    Climate(settings=settings).render_all_formats(
+        filename="{dir_parts}/climate_{abs_lat:02d}{ns}_{lang}_{astrolabe_type}".format(**subs)
+    )
+
+    # Make combined mother and climate
+    CompositeComponent(
+        settings=settings,
+        components=[
+            MotherFront(settings=settings),
+            Climate(settings=settings)
+        ]
+    ).render_all_formats(
+        filename="{dir_parts}/mother_front_combi_{abs_lat:02d}{ns}_{lang}_{astrolabe_type}".format(**subs)
+    )
+
+    # Copy the PDF versions of the components of this astrolabe into LaTeX's working directory, to produce a
+    # PDF file containing all the parts of this astrolabe
+    os.makedirs("{dir_doc}/tmp".format(**subs), exist_ok=True)
+    shutil.copyfile("doc/astrolabe.tex", "{dir_doc}/astrolabe.tex".format(**subs))
+    shutil.copyfile("{dir_parts}/mother_back_{abs_lat:02d}{ns}_{lang}_{astrolabe_type}.pdf".format(**subs),
+                    "{dir_doc}/tmp/mother_back.pdf".format(**subs))
+    shutil.copyfile("{dir_parts}/mother_front_combi_{abs_lat:02d}{ns}_{lang}_{astrolabe_type}.pdf".format(**subs),
+                    "{dir_doc}/tmp/mother_front.pdf".format(**subs))
+    shutil.copyfile("{dir_parts}/rete_{abs_lat:02d}{ns}_{lang}_{astrolabe_type}.pdf".format(**subs),
+                    "{dir_doc}/tmp/rete.pdf".format(**subs))
+    shutil.copyfile("{dir_parts}/rule_{abs_lat:02d}{ns}_{lang}_{astrolabe_type}.pdf".format(**subs),
+                    "{dir_doc}/tmp/rule.pdf".format(**subs))
+
+    with open("{dir_doc}/tmp/lat.tex".format(**subs), "wt") as f:
+        f.write(r"${abs_lat:d}^\circ${ns}".format(**subs))
+
+    # Build LaTeX documentation. We discard pdflatex's copious stdout rather than buffering it.
+    # The cross-references in this document converge after very few passes, so rather than always running a
+    # fixed number of passes, we re-run pdflatex only until the .aux file stops changing. The intermediate
+    # passes run in draft mode, which skips generation of PDF output entirely; a final non-draft pass then
+    # produces the actual PDF.
+    latex_command: List[str] = ["pdflatex", "-interaction=nonstopmode", "-halt-on-error", "astrolabe.tex"]
+
+    # If a precompiled format file is available, use it to skip re-reading the preamble on every pass
+    if os.path.exists("doc/astrolabe_format.fmt"):
+        shutil.copyfile("doc/astrolabe_format.fmt", "{dir_doc}/astrolabe_format.fmt".format(**subs))
+        latex_command.insert(1, "-fmt=astrolabe_format")
+    aux_path: str = "{dir_doc}/astrolabe.aux".format(**subs)
+    aux_hash: Optional[bytes] = None
+    for build_pass in range(3):
+        subprocess.run(latex_command[:1] + ["-draftmode"] + latex_command[1:],
+                       cwd=dir_doc, check=True, stdout=subprocess.DEVNULL)
+        with open(aux_path, "rb") as aux_file:
+            aux_hash_new: bytes = hashlib.blake2b(aux_file.read()).digest()
+        if aux_hash_new == aux_hash:
+            break
+        aux_hash = aux_hash_new
+    subprocess.run(latex_command,
+                   cwd=dir_doc, check=True, stdout=subprocess.DEVNULL)
+    os.replace("{dir_doc}/astrolabe.pdf".format(**subs),
+               "{dir_out}/astrolabe_{abs_lat:02d}{ns}_{lang}_{astrolabe_type}.pdf".format(**subs))
+
+    # For the English language astrolabe, create a symlink with no language suffix in the filename
+    if language == "en" and astrolabe_type == "full":
+        os.symlink("astrolabe_{abs_lat:02d}{ns}_en_full.pdf".format(**subs),
+                   "{dir_out}/astrolabe_{abs_lat:02d}{ns}.pdf".format(**subs))
+
+    # Clean up the rubbish that LaTeX leaves behind
+    shutil.rmtree(dir_doc)
+
+
+# Do it right away if we're run as a script
+if __name__ == "__main__":
+    # Create clean output directory
+    shutil.rmtree("output", ignore_errors=True)
+    os.makedirs("output/astrolabes", exist_ok=True)
+    os.makedirs("output/astrolabe_parts", exist_ok=True)
+
+    arguments: Dict[str, Union[int, str]] = fetch_command_line_arguments()
+    theme: str = arguments['theme']
+
+    # Precompile the LaTeX preamble once, so that the per-astrolabe pdflatex runs can skip it
+    build_latex_format()
+
+    # Build a list of all the astrolabes we are to render -- all available languages, simplified and full
+    # astrolabes, and climates for latitudes at 5-degree spacings from 10 deg -- 85 deg, plus 52N
+    jobs: List[Tuple[str, str, float, str]] = [
+        (language, astrolabe_type, latitude, theme)
+        for language in text.text
+        for astrolabe_type in ["full", "simplified"]
+        for latitude in list(range(-80, 90, 5)) + [52]
+        # Do not make equatorial astrolabes, as they don't really work
+        if not -10 < latitude < 10
+    ]
+
+    # The location-independent parts only need rendering once per hemisphere
+    shared_jobs: List[Tuple[str, str, str, str]] = [
+        (language, astrolabe_type, hemisphere, theme)
+        for language in text.text
+        for astrolabe_type in ["full", "simplified"]
+        for hemisphere in ["N", "S"]
+    ]
+
+    # Each rendering job is independent, so we farm the jobs out across all available CPU cores. The shared
+    # parts must all exist before the per-latitude jobs copy them, so the two stages run separately.
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+        for result in pool.map(render_shared_parts, *zip(*shared_jobs)):
+            pass
+        for result in pool.map(render_one, *zip(*jobs)):
+            pass
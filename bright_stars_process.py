@@ -20,9 +20,28 @@
 This script takes the Yale Bright Star Catalogue, and formats it into a Python list. It also adds the names of objects.
 """
 
-import re
+from typing import Dict, Final, List, Tuple, Union
 
-from typing import Dict, Final, List, Union
+import numpy as np
+
+# Convert three-letter abbreviations of Greek letters into UTF-8
+greek_alphabet: Dict[str, str] = {
+    'Alp': '\u03b1', 'Bet': '\u03b2', 'Gam': '\u03b3', 'Del': '\u03b4', 'Eps': '\u03b5',
+    'Zet': '\u03b6', 'Eta': '\u03b7', 'The': '\u03b8', 'Iot': '\u03b9', 'Kap': '\u03ba',
+    'Lam': '\u03bb', 'Mu': '\u03bc', 'Nu': '\u03bd', 'Xi': '\u03be', 'Omi': '\u03bf',
+    'Pi': '\u03c0', 'Rho': '\u03c1', 'Sig': '\u03c3', 'Tau': '\u03c4', 'Ups': '\u03c5',
+    'Phi': '\u03c6', 'Chi': '\u03c7', 'Psi': '\u03c8', 'Ome': '\u03c9'}
+
+# Superscript numbers which we may place after Greek letters to form the Flamsteed designations of stars
+star_suffices: Dict[str, str] = {'1': '\u00B9', '2': '\u00B2', '3': '\u00B3'}
+
+# Precomputed Bayer designations for every combination of Greek letter and superscript suffix, so that the
+# per-star loop below does a single dictionary lookup rather than rebuilding the string for each star
+bayer_designations: Dict[Tuple[str, str], str] = {
+    (greek, suffix): letter + superscript
+    for greek, letter in greek_alphabet.items()
+    for suffix, superscript in list(star_suffices.items()) + [('', '')]
+}
 
 
 def fetch_bright_star_list() -> Dict[str, Union[list, dict]]:
@@ -41,107 +60,135 @@ def fetch_bright_star_list() -> Dict[str, Union[list, dict]]:
     # Build a dictionary of stars, indexed by HD number
     stars: Dict[int, Tuple[float, float, float, str, str, str, str]] = {}
 
-    # Convert three-letter abbreviations of Greek letters into UTF-8
-    greek_alphabet: Dict[str, str] = {
-        'Alp': '\u03b1', 'Bet': '\u03b2', 'Gam': '\u03b3', 'Del': '\u03b4', 'Eps': '\u03b5',
-        'Zet': '\u03b6', 'Eta': '\u03b7', 'The': '\u03b8', 'Iot': '\u03b9', 'Kap': '\u03ba',
-        'Lam': '\u03bb', 'Mu': '\u03bc', 'Nu': '\u03bd', 'Xi': '\u03be', 'Omi': '\u03bf',
-        'Pi': '\u03c0', 'Rho': '\u03c1', 'Sig': '\u03c3', 'Tau': '\u03c4', 'Ups': '\u03c5',
-        'Phi': '\u03c6', 'Chi': '\u03c7', 'Psi': '\u03c8', 'Ome': '\u03c9'}
-
-    # Superscript numbers which we may place after Greek letters to form the Flamsteed designations of stars
-    star_suffices: Dict[str, str] = {'1': '\u00B9', '2': '\u00B2', '3': '\u00B3'}
-
-    # Look up the common names of bright stars
-    star_names: Dict[int, str] = {}
+    # Look up the common names of bright stars. The catalog is indexed by the HR number of each star in the
+    # first column; the second column is the name of the star, with underscores in the place of spaces. We
+    # read the whole file in one go and build the index as a single dict comprehension, ignoring blank lines
+    # and comment lines.
     with open("raw_data/bright_star_names.dat", "rt") as f_in:
-        for line in f_in:
-            # Ignore blank lines and comment lines
-            if (len(line) < 5) or (line[0] == '#'):
-                continue
-            # Catalog is indexed by the HR number of each star in the first column
-            bs_num: int = int(line[0:4])
-
-            # The second column is the name of the star, with underscores in the place of spaces
-            name: str = line[5:]
-            star_names[bs_num] = re.sub(' ', '_', name.strip())
-
-    # Loop through the Yale Bright Star Catalog, line by line
-    bs_num: int = 0
+        name_lines: List[str] = f_in.read().splitlines()
+    star_names: Dict[int, str] = {
+        int(line[0:4]): line[5:].strip().replace(' ', '_')
+        for line in name_lines
+        if (len(line) >= 5) and (line[0] != '#')
+    }
+
+    # Read the Yale Bright Star Catalog in one go, ignoring blank lines and comment lines. The bright star
+    # number -- i.e. the HR number -- of each star is its position in the filtered list of lines.
     with open("raw_data/bright_star_catalog.dat", "rt") as f_in:
-        for line in f_in:
-            # Ignore blank lines and comment lines
-            if (len(line) < 100) or (line[0] == '#'):
-                continue
-
-            # Counter used too calculated the bright star number -- i.e. the HR number -- of each star
-            bs_num += 1
-            try:
-                # Read the Henry Draper (i.e. HD) number for this star
-                hd: int = int(line[25:31])
-
-                # Read the right ascension of this star (J2000)
-                ra_hrs: float = float(line[75:77])
-                ra_min: float = float(line[77:79])
-                ra_sec: float = float(line[79:82])
-
-                # Read the declination of this star (J2000)
-                dec_neg: bool = (line[83] == '-')
-                dec_deg: float = float(line[84:86])
-                dec_min: float = float(line[86:88])
-                dec_sec: float = float(line[88:90])
-
-                # Read the V magnitude of this star
-                mag: float = float(line[102:107])
-            except ValueError:
-                continue
-
-            # Look up the Bayer number of this star, if one exists
-            star_num: int = -1
-            try:
-                star_num = int(line[4:7])
-            except ValueError:
-                pass
-
-            # Render a unicode string containing the name, Flamsteed designation, and Bayer designation for this star
-            name_bayer: str = "-"
-            name_bayer_full: str = "-"
-            name_english: str = "-"
-            name_flamsteed_full: str = "-"
-
-            # Look up the Greek letter (Flamsteed designation) of this star
-            greek: str = line[7:10].strip()
-
-            # Look up the abbreviation of the constellation this star is in
-            const: str = line[11:14].strip()
-
-            # Some stars have a suffix after the Flamsteed designation, e.g. alpha-1, alpha-2, etc.
-            greek_letter_suffix: str = line[10]
-            if greek in greek_alphabet:
-                name_bayer: str = greek_alphabet[greek]
-                if greek_letter_suffix in star_suffices:
-                    name_bayer += star_suffices[greek_letter_suffix]
-                name_bayer_full: str = '{}-{}'.format(name_bayer, const)
-            if star_num > 0:
-                name_flamsteed_full: str = '{}-{}'.format(star_num, const)
-
-            # See if this is a star with a name
-            if bs_num in star_names:
-                name_english: str = star_names[bs_num]
-
-            # Turn RA and Dec from sexagesimal units into decimal
-            ra: float = (ra_hrs + ra_min / 60 + ra_sec / 3600) / 24 * 360
-            dec: float = (dec_deg + dec_min / 60 + dec_sec / 3600)
-            if dec_neg:
-                dec = -dec
-
-            # Build a dictionary is stars, indexed by HD number
-            stars[hd] = (ra, dec, mag, name_bayer, name_bayer_full, name_english, name_flamsteed_full)
+        lines: List[str] = [line for line in f_in if (len(line) >= 100) and (line[0] != '#')]
+
+    def float_column(start: int, end: int) -> np.ndarray:
+        """
+        Parse a fixed-width numeric column from the catalog in a single vectorized pass. Fields which are
+        blank are returned as NaN.
+        """
+        column: np.ndarray = np.char.strip(np.array([line[start:end] for line in lines]))
+        values: np.ndarray = np.full(len(lines), np.nan)
+        populated: np.ndarray = column != ''
+        values[populated] = column[populated].astype(float)
+        return values
+
+    # Read the Henry Draper (i.e. HD) number of each star
+    hd_column: np.ndarray = float_column(25, 31)
+
+    # Read the right ascension of each star (J2000)
+    ra_hrs: np.ndarray = float_column(75, 77)
+    ra_min: np.ndarray = float_column(77, 79)
+    ra_sec: np.ndarray = float_column(79, 82)
+
+    # Read the declination of each star (J2000)
+    dec_neg: np.ndarray = np.array([line[83] == '-' for line in lines])
+    dec_deg: np.ndarray = float_column(84, 86)
+    dec_min: np.ndarray = float_column(86, 88)
+    dec_sec: np.ndarray = float_column(88, 90)
+
+    # Read the V magnitude of each star
+    mag_column: np.ndarray = float_column(102, 107)
+
+    # Read the Flamsteed number of each star, if one exists. Unlike the other numeric columns, this field
+    # can also contain text (e.g. nova designations), so anything non-numeric parses to NaN.
+    star_num_strings: np.ndarray = np.char.strip(np.array([line[4:7] for line in lines]))
+    star_num_column: np.ndarray = np.full(len(lines), np.nan)
+    star_num_populated: np.ndarray = np.char.isdigit(star_num_strings)
+    star_num_column[star_num_populated] = star_num_strings[star_num_populated].astype(float)
+
+    # Turn RA and Dec from sexagesimal units into decimal, as vectorized column operations
+    ra_column: np.ndarray = (ra_hrs + ra_min / 60 + ra_sec / 3600) / 24 * 360
+    dec_column: np.ndarray = np.where(dec_neg, -1, 1) * (dec_deg + dec_min / 60 + dec_sec / 3600)
+
+    # Discard stars for which any of the required numeric fields are blank
+    valid: np.ndarray = ~(np.isnan(hd_column) | np.isnan(ra_column) | np.isnan(dec_column) |
+                          np.isnan(mag_column))
+
+    # The numeric columns are returned as parallel NumPy arrays (structure-of-arrays), indexed in catalog
+    # order, so that consumers can vectorize coordinate transforms over the whole catalog at once
+    hd_arr: np.ndarray = hd_column[valid].astype(np.int64)
+    ra_arr: np.ndarray = ra_column[valid]
+    dec_arr: np.ndarray = dec_column[valid]
+    mag_arr: np.ndarray = mag_column[valid]
+
+    # The name columns are parallel Python lists in the same order
+    name_bayer_list: List[str] = []
+    name_bayer_full_list: List[str] = []
+    name_english_list: List[str] = []
+    name_flamsteed_full_list: List[str] = []
+
+    # Loop over the valid stars, building their names
+    for index in np.flatnonzero(valid):
+        line: str = lines[index]
+        bs_num: int = index + 1
+        hd: int = int(hd_column[index])
+        ra: float = float(ra_column[index])
+        dec: float = float(dec_column[index])
+        mag: float = float(mag_column[index])
+
+        # Look up the Bayer number of this star, if one exists
+        star_num: int = -1 if np.isnan(star_num_column[index]) else int(star_num_column[index])
+
+        # Render a unicode string containing the name, Flamsteed designation, and Bayer designation for this star
+        name_bayer: str = "-"
+        name_bayer_full: str = "-"
+        name_english: str = "-"
+        name_flamsteed_full: str = "-"
+
+        # Look up the Greek letter (Flamsteed designation) of this star
+        greek: str = line[7:10].strip()
+
+        # Look up the abbreviation of the constellation this star is in
+        const: str = line[11:14].strip()
+
+        # Some stars have a suffix after the Flamsteed designation, e.g. alpha-1, alpha-2, etc.
+        greek_letter_suffix: str = line[10] if line[10] in star_suffices else ''
+        if (greek, greek_letter_suffix) in bayer_designations:
+            name_bayer: str = bayer_designations[(greek, greek_letter_suffix)]
+            name_bayer_full: str = f'{name_bayer}-{const}'
+        if star_num > 0:
+            name_flamsteed_full: str = f'{star_num}-{const}'
+
+        # See if this is a star with a name
+        if bs_num in star_names:
+            name_english: str = star_names[bs_num]
+
+        # Build a dictionary is stars, indexed by HD number
+        stars[hd] = (ra, dec, mag, name_bayer, name_bayer_full, name_english, name_flamsteed_full)
+
+        name_bayer_list.append(name_bayer)
+        name_bayer_full_list.append(name_bayer_full)
+        name_english_list.append(name_english)
+        name_flamsteed_full_list.append(name_flamsteed_full)
 
     hd_numbers: List[int] = list(stars.keys())
     hd_numbers.sort()
 
     return {
         'stars': stars,
-        'hd_numbers': hd_numbers
+        'hd_numbers': hd_numbers,
+        'hd': hd_arr,
+        'ra': ra_arr,
+        'dec': dec_arr,
+        'mag': mag_arr,
+        'name_bayer': name_bayer_list,
+        'name_bayer_full': name_bayer_full_list,
+        'name_english': name_english_list,
+        'name_flamsteed_full': name_flamsteed_full_list
     }
@@ -20,9 +20,23 @@
 Various helper functions for turning calendar dates into Unix times, and vice versa.
 """
 
+from functools import lru_cache
 from math import floor, fmod
 from typing import List, Tuple
 
+import numpy as np
+
+try:
+    # Numba is optional. If it is available, we JIT-compile the scalar date-arithmetic kernels below into
+    # native code; if not, they run as ordinary Python functions.
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        def wrapper(func):
+            return func
+
+        return wrapper
+
 # The day of the year on which each month begins
 month_day: List[int] = [0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334, 999]
 
@@ -34,9 +48,14 @@ month_name_full: List[str] = ["January", "February", "March", "April", "May", "J
                               "July", "August", "September", "October", "November", "December"]
 
 
-def julian_day(year: int, month: int, day: int, hour: int = 0, minute: int = 0, sec: float = 0) -> float:
+@lru_cache(maxsize=4096)
+@njit(cache=True)
+def _julian_day_date(year: int, month: int, day: int) -> float:
     """
-    Convert a calendar date into a Julian Date.
+    Convert a calendar date, at midnight, into a Julian Date.
+
+    The astrolabe drawing code calls this with the same small set of dates over and over again -- month
+    boundaries, epoch anchors -- so the results are memoized with an LRU cache.
 
     :param year:
         Integer year number.
@@ -44,12 +63,6 @@ def julian_day(year: int, month: int, day: int, hour: int = 0, minute: int = 0,
         Integer month number (1-12)
     :param day:
         Integer day of month (1-31)
-    :param hour:
-        Integer hour of day (0-23)
-    :param minute:
-        Integer minutes past the hour (0-59)
-    :param sec:
-        Floating point seconds past minute (0-60)
     :return:
         float Julian date
     """
@@ -68,11 +81,68 @@ def julian_day(year: int, month: int, day: int, hour: int = 0, minute: int = 0,
     else:
         raise IndexError("The requested date never happened")
 
-    jd: float = 365.0 * year - 679004.0 + 2400000.5 + b + floor(30.6001 * (month + 1)) + day
+    return 365.0 * year - 679004.0 + 2400000.5 + b + floor(30.6001 * (month + 1)) + day
+
+
+def julian_day(year: int, month: int, day: int, hour: int = 0, minute: int = 0, sec: float = 0) -> float:
+    """
+    Convert a calendar date into a Julian Date.
+
+    :param year:
+        Integer year number.
+    :param month:
+        Integer month number (1-12)
+    :param day:
+        Integer day of month (1-31)
+    :param hour:
+        Integer hour of day (0-23)
+    :param minute:
+        Integer minutes past the hour (0-59)
+    :param sec:
+        Floating point seconds past minute (0-60)
+    :return:
+        float Julian date
+    """
     day_fraction: float = (int(hour) + int(minute) / 60.0 + sec / 3600.0) / 24.0
-    return jd + day_fraction
+    return _julian_day_date(year, month, day) + day_fraction
+
+
+def julian_day_arr(years: np.ndarray, months: np.ndarray, days: np.ndarray) -> np.ndarray:
+    """
+    Convert arrays of calendar dates (at midnight) into an array of Julian Dates, in a single vectorized pass.
+
+    :param years:
+        Array of integer year numbers.
+    :param months:
+        Array of integer month numbers (1-12)
+    :param days:
+        Array of integer days of month (1-31)
+    :return:
+        Array of float Julian dates
+    """
+    last_julian: float = 15821209.0
+    first_gregorian: float = 15821220.0
+
+    years = np.asarray(years, dtype=np.float64)
+    months = np.asarray(months, dtype=np.float64)
+    days = np.asarray(days, dtype=np.float64)
+    req_date: np.ndarray = 10000.0 * years + 100 * months + days
+
+    if np.any((req_date > last_julian) & (req_date < first_gregorian)):
+        raise IndexError("The requested date never happened")
+
+    early_month: np.ndarray = months <= 2
+    months = np.where(early_month, months + 12, months)
+    years = np.where(early_month, years - 1, years)
 
+    b: np.ndarray = np.where(req_date <= last_julian,
+                             -2 + np.floor((years + 4716) / 4) - 1179,  # Julian calendar
+                             np.floor(years / 400) - np.floor(years / 100) + np.floor(years / 4))  # Gregorian
 
+    return 365.0 * years - 679004.0 + 2400000.5 + b + np.floor(30.6001 * (months + 1)) + days
+
+
+@njit(cache=True)
 def inv_julian_day(jd: float) -> Tuple[int, int, int, int, int, float]:
     """
     Convert a Julian date into a calendar date.
@@ -82,14 +152,17 @@ def inv_julian_day(jd: float) -> Tuple[int, int, int, int, int, float]:
     :return:
         Calendar date
     """
-    day_fraction: float = (jd + 0.5) - floor(jd + 0.5)
-    hour: int = int(floor(24 * day_fraction))
-    minute: int = int(floor(fmod(1440 * day_fraction, 60)))
-    sec: float = fmod(86400 * day_fraction, 60)
+    # The day fraction is always positive, so int() truncation is equivalent to floor(), and % on floats is
+    # equivalent to fmod(); both save a trip through a C library function per call
+    jd_half: float = jd + 0.5
+    day_fraction: float = jd_half - floor(jd_half)
+    hour: int = int(24 * day_fraction)
+    minute: int = int((1440 * day_fraction) % 60)
+    sec: float = (86400 * day_fraction) % 60
 
     # Number of whole Julian days. b = Number of centuries since the Council of Nicaea.
     # c = Julian Day number as if century leap years happened.
-    a: int = int(jd + 0.5)
+    a: int = int(jd_half)
     if a < 2361222.0:
         c: int = int(a + 1524)  # Julian calendar
     else:
@@ -98,9 +171,43 @@ def inv_julian_day(jd: float) -> Tuple[int, int, int, int, int, float]:
     d: int = int((c - 122.1) / 365.25)  # Number of 365.25 periods, starting the year at the end of February
     e_: int = int(365 * d + d / 4)  # Number of days accounted for by these
     f: int = int((c - e_) / 30.6001)  # Number of 30.6001 days periods (a.k.a. months) in remainder
-    day: int = int(floor(c - e_ - int(30.6001 * f)))
-    month: int = int(floor(f - 1 - 12 * (f >= 14)))
-    year: int = int(floor(d - 4715 - int(month >= 3)))
+    day: int = c - e_ - int(30.6001 * f)
+    month: int = f - 1 - 12 * (f >= 14)
+    year: int = d - 4715 - (month >= 3)
+
+    return year, month, day, hour, minute, sec
+
+
+def inv_julian_day_array(jd: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray,
+                                                  np.ndarray]:
+    """
+    Convert an array of Julian dates into arrays of calendar dates, in a single vectorized pass.
+
+    :param jd:
+        Array of Julian dates
+    :return:
+        Tuple of arrays (year, month, day, hour, minute, sec)
+    """
+    jd = np.asarray(jd, dtype=np.float64)
+    jd_half: np.ndarray = jd + 0.5
+    day_fraction: np.ndarray = jd_half - np.floor(jd_half)
+    hour: np.ndarray = (24 * day_fraction).astype(np.int64)
+    minute: np.ndarray = ((1440 * day_fraction) % 60).astype(np.int64)
+    sec: np.ndarray = (86400 * day_fraction) % 60
+
+    # Number of whole Julian days. b = Number of centuries since the Council of Nicaea.
+    # c = Julian Day number as if century leap years happened.
+    a: np.ndarray = jd_half.astype(np.int64)
+    b: np.ndarray = ((a - 1867216.25) / 36524.25).astype(np.int64)
+    c: np.ndarray = np.where(a < 2361222.0,
+                             a + 1524,  # Julian calendar
+                             (a + b - (b / 4) + 1525).astype(np.int64))  # Gregorian calendar
+    d: np.ndarray = ((c - 122.1) / 365.25).astype(np.int64)  # Number of 365.25 periods
+    e_: np.ndarray = (365 * d + d / 4).astype(np.int64)  # Number of days accounted for by these
+    f: np.ndarray = ((c - e_) / 30.6001).astype(np.int64)  # Number of 30.6001 day periods in remainder
+    day: np.ndarray = c - e_ - (30.6001 * f).astype(np.int64)
+    month: np.ndarray = f - 1 - 12 * (f >= 14)
+    year: np.ndarray = d - 4715 - (month >= 3)
 
     return year, month, day, hour, minute, sec
 
@@ -120,6 +227,7 @@ def date_string(utc: float) -> str:
 
 
 # Returns a Unix timestamp from a Julian Day number
+@njit(cache=True)
 def unix_from_jd(jd: float) -> float:
     """
     Convert a Julian date into a unix time.
@@ -132,6 +240,7 @@ def unix_from_jd(jd: float) -> float:
     return 86400.0 * (jd - 2440587.5)
 
 
+@njit(cache=True)
 def jd_from_unix(utc: float) -> float:
     """
     Convert a unix time into a Julian date.
@@ -21,16 +21,26 @@
 Render the climate of the astrolabe.
 """
 
-from math import pi, sin, tan, cos, atan2, hypot, acos
-from typing import Dict
-
-from constants import unit_deg, unit_cm, unit_mm, inclination_ecliptic, centre_scaling, r_1, d_12, tab_size
+# Scalar trig always comes from <math>; numpy's trig is only ever applied to whole arrays, where its
+# per-call overhead is amortized. numpy trig on scalars is roughly an order of magnitude slower than <math>.
+from math import pi, sin, tan, cos, atan2, acos
+from typing import Dict, List, Tuple
+
+import numpy as np
+from climate_kernel import compute_altitude_arcs, compute_azimuth_arcs
+from constants import (unit_deg, unit_cm, unit_mm, centre_scaling, r_1, d_12, tab_size,
+                       sin_tab_size, cos_tab_size, r4_over_r2)
 from graphics_context import BaseComponent, GraphicsContext
-from numpy import arange
 from settings import fetch_command_line_arguments
 from text import text
 from themes import themes
 
+# The altitudes at which we draw lines of constant altitude, and the angular radius of each circle of constant
+# altitude on the celestial sphere. These never change, so we compute them once at import time.
+constant_altitudes: np.ndarray = np.array([-6, 0, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 75, 80, 85],
+                                          dtype=np.float64)
+constant_altitude_half_angles: np.ndarray = (90 - constant_altitudes) * unit_deg
+
 
 class Climate(BaseComponent):
     """
@@ -74,12 +84,30 @@ class Climate(BaseComponent):
             None
         """
 
+        # Bind the scalar trig functions to locals, turning the global lookup on every call in the loops
+        # below into a fast local-variable load
+        _sin = sin
+        _cos = cos
+        _tan = tan
+        _acos = acos
+        _atan2 = atan2
+
+        # Loop-invariant angle constants, hoisted out of the loops below
+        half_turn: float = 180 * unit_deg
+        quarter_turn: float = 90 * unit_deg
+
         is_southern: bool = settings['latitude'] < 0
         latitude: float = abs(settings['latitude'])
         language: str = settings['language']
         theme: Dict[str, Tuple[float, float, float, float]] = themes[settings['theme']]
 
-        context.set_color(color=theme['lines'])
+        # Hoist the dictionary lookups that the rendering loops below perform over and over
+        color_lines: Tuple[float, float, float, float] = theme['lines']
+        color_alt_az: Tuple[float, float, float, float] = theme['alt_az']
+        color_text: Tuple[float, float, float, float] = theme['text']
+        text_lang: dict = text[language]
+
+        context.set_color(color=color_lines)
 
         context.set_font_size(0.8)
 
@@ -95,10 +123,10 @@ class Climate(BaseComponent):
         r_3: float = d_12 * centre_scaling
 
         # Radius of the line denoting the equator
-        r_4: float = r_2 * tan((90 - inclination_ecliptic) / 2 * unit_deg)
+        r_4: float = r_2 * r4_over_r2
 
         # Radius of the line denoting the tropic of Cancer
-        r_5: float = r_4 * tan((90 - inclination_ecliptic) / 2 * unit_deg)
+        r_5: float = r_4 * r4_over_r2
 
         # Draw the outer edge of climate, and the central hole, and use these to create a clipping region
         context.begin_path()
@@ -122,73 +150,75 @@ class Climate(BaseComponent):
         context.begin_path()
         context.arc(centre_x=0, centre_y=0, radius=r_tab,
                     arc_from=-tab_size - pi / 2, arc_to=tab_size - pi / 2)
-        context.move_to(x=r_tab * sin(tab_size), y=-r_tab * cos(tab_size))
-        context.line_to(x=r_2 * sin(tab_size), y=-r_2 * cos(tab_size))
-        context.move_to(x=-r_tab * sin(tab_size), y=-r_tab * cos(tab_size))
-        context.line_to(x=-r_2 * sin(tab_size), y=-r_2 * cos(tab_size))
+        context.move_to(x=r_tab * sin_tab_size, y=-r_tab * cos_tab_size)
+        context.line_to(x=r_2 * sin_tab_size, y=-r_2 * cos_tab_size)
+        context.move_to(x=-r_tab * sin_tab_size, y=-r_tab * cos_tab_size)
+        context.line_to(x=-r_2 * sin_tab_size, y=-r_2 * cos_tab_size)
         context.stroke()
 
         # The maths involved in drawing the climate is described in this paper:
         # http://adsabs.harvard.edu/abs/1976JBAA...86..125E
 
-        # Draw lines of constant altitude
-        altitude: float
+        # Draw lines of constant altitude. The projection of each circle of constant altitude is computed for
+        # all the altitudes at once, by a kernel which numba JIT-compiles when it is available.
+        y_a_arr: np.ndarray
+        y_b_arr: np.ndarray
+        y_a_arr, y_b_arr = compute_altitude_arcs(latitude_rad=latitude * unit_deg, r_4=r_4,
+                                                 half_angles=constant_altitude_half_angles)
+
         horizon_centre: float = 0
         horizon_radius: float = 0
-        for altitude in [-6, 0, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 75, 80, 85]:
-            theta1: float = (-latitude - (90 - altitude)) * unit_deg
-            theta2: float = (-latitude + (90 - altitude)) * unit_deg
+        for index, altitude in enumerate(constant_altitudes):
+            y_a: float = float(y_a_arr[index])
+            y_b: float = float(y_b_arr[index])
 
-            x1: float = r_4 * sin(theta1)
-            y1: float = r_4 * cos(theta1)
-            x2: float = r_4 * sin(theta2)
-            y2: float = r_4 * cos(theta2)
-
-            y_a: float = y1 * (r_4 / (r_4 - x1))
-            y_b: float = y2 * (r_4 / (r_4 - x2))
+            # Centre and radius of the arc for this altitude, computed once and reused throughout
+            arc_mid: float = (y_a + y_b) / 2
+            arc_half: float = (y_b - y_a) / 2
 
             # Record centre and radius of the arc denoting the horizon
             if altitude == 0:
-                horizon_centre = (y_a + y_b) / 2
-                horizon_radius = (y_b - y_a) / 2
+                horizon_centre = arc_mid
+                horizon_radius = arc_half
 
             context.set_font_style(bold=True)
-            context.set_color(theme['text'])
+            context.set_color(color_text)
 
             if y_b < r_2:
                 if (altitude % 10) == 0:
                     context.text(text="{:.0f}".format(float(altitude)),
                                  x=0, y=-y_b, h_align=0, v_align=1, gap=0, rotation=0)
             else:
-                r: float = (y_b - y_a) / 2
-                y: float = (y_a + y_b) / 2
-                start: float = 180 * unit_deg - acos(
-                    (r ** 2 + y ** 2 - r_2 ** 2) / (2 * ((y_b - y_a) / 2) * ((y_a + y_b) / 2)))
-                end: float = -start
+                # Only work out where the labels go if this altitude actually gets labelled
                 if (altitude > 0) and (altitude % 10 == 0):
+                    start: float = half_turn - _acos((arc_half ** 2 + arc_mid ** 2 - r_2 ** 2) /
+                                                     (2 * arc_half * arc_mid))
+                    end: float = -start
+                    offset_2: float = (r_2 / arc_half) * 2 * unit_deg
+                    offset_3: float = (r_2 / arc_half) * 3 * unit_deg
                     context.text(text="{:.0f}".format(float(altitude)),
-                                 x=r * sin(start + (r_2 / r) * 2 * unit_deg),
-                                 y=-(y_a + y_b) / 2 - r * cos(start + (r_2 / r) * 3 * unit_deg),
+                                 x=arc_half * _sin(start + offset_2),
+                                 y=-arc_mid - arc_half * _cos(start + offset_3),
                                  h_align=0, v_align=0,
                                  gap=0,
-                                 rotation=180 * unit_deg + (start + (r_2 / r) * 3 * unit_deg))
+                                 rotation=half_turn + (start + offset_3))
                     context.text(text="{:.0f}".format(float(altitude)),
-                                 x=r * sin(end - (r_2 / r) * 2 * unit_deg),
-                                 y=-(y_a + y_b) / 2 - r * cos(end - (r_2 / r) * 3 * unit_deg),
+                                 x=arc_half * _sin(end - offset_2),
+                                 y=-arc_mid - arc_half * _cos(end - offset_3),
                                  h_align=0, v_align=0,
                                  gap=0,
-                                 rotation=180 * unit_deg + (end - (r_2 / r) * 3 * unit_deg))
+                                 rotation=half_turn + (end - offset_3))
 
             context.begin_path()
-            context.circle(centre_x=0, centre_y=-(y_a + y_b) / 2, radius=(y_b - y_a) / 2)
+            context.circle(centre_x=0, centre_y=-arc_mid, radius=arc_half)
             context.stroke(dotted=(altitude < 0),
-                           line_width=0.6 + 1.2 * int(altitude == 0),
-                           color=theme['alt_az'] if altitude > 0 else theme['lines'])
+                           line_width=1.8 if altitude == 0 else 0.6,
+                           color=color_alt_az if altitude > 0 else color_lines)
 
         # Find coordinates of P
         theta: float = -latitude * unit_deg
-        p_x: float = r_4 * sin(theta)
-        p_y: float = r_4 * cos(theta)
+        p_x: float = r_4 * _sin(theta)
+        p_y: float = r_4 * _cos(theta)
 
         # Find coordinates of Z
         z_x: float = 0
@@ -199,85 +229,90 @@ class Climate(BaseComponent):
         zh_y: float = z_y / 2
 
         # Find bearing of T from ZH (clockwise from right-going axis)
-        theta: float = atan2(z_x - (-r_4), z_y)
+        theta: float = _atan2(z_x - (-r_4), z_y)
 
         # Find coordinates of T
         t_x: float = 0
-        t_y: float = zh_y + zh_x * tan(theta)
+        t_y: float = zh_y + zh_x * _tan(theta)
 
         # Draw lines of constant azimuth. We draw 16 arcs at 11.25 degree intervals, which cut through the zenith
         # and meet the horizon in two opposite compass bearings. For this reason we only draw half as many arcs as
         # there are compass bearings
-        step_size: float = 11.25 * unit_deg
-        for azimuth_step in range(1, 16):
-            azimuth: float = -90 * unit_deg + step_size * azimuth_step
+        r_2_sq_09: float = (0.9 * r_2) ** 2
 
-            # Compass direction for the start and end of the line of constant azimuth. Each line of constant azimuth
-            # meets the horizon at two opposite points, with opposite compass directions.
+        # The geometry of all the arcs is computed in one go by a kernel which numba JIT-compiles when it is
+        # available; the loop below only issues the drawing calls
+        t_xs, t_rs, starts, ends, start2s, end2s = compute_azimuth_arcs(
+            z_y=z_y, t_y=t_y, horizon_centre=horizon_centre, horizon_radius=horizon_radius, r_2=r_2)
+
+        # Compass direction for the start and end of each line of constant azimuth. Each line of constant
+        # azimuth meets the horizon at two opposite points, with opposite compass directions; in the southern
+        # hemisphere, the directions are inverted. We build the table once rather than branching per arc.
+        directions: List[Tuple[str, str]] = []
+        for azimuth_step in range(1, 16):
             if (azimuth_step % 2) != 0:
                 direction_start, direction_end = ("", "")
             else:
-                direction_start: str = text[language]['directions'][azimuth_step // 2]
-                direction_end: str = text[language]['directions'][azimuth_step // 2 + 8]
-
-            # In southern hemisphere, invert directions
+                direction_start = text_lang['directions'][azimuth_step // 2]
+                direction_end = text_lang['directions'][azimuth_step // 2 + 8]
             if is_southern:
                 direction_start, direction_end = (direction_end, direction_start)
+            directions.append((direction_start, direction_end))
 
-            t_x: float = (z_y - t_y) * tan(azimuth)
-
-            # Radius of arc of constant azimuth
-            t_r: float = hypot(t_x, t_y - z_y)
+        for azimuth_step in range(1, 16):
+            direction_start, direction_end = directions[azimuth_step - 1]
 
-            t_hc: float = hypot(t_x, t_y - horizon_centre)  # Distance from T to centre of horizon
-            theta: float = acos((t_r ** 2 + t_hc ** 2 - horizon_radius ** 2) / (2 * t_r * t_hc))
-            phi: float = atan2(t_x, horizon_centre - t_y)
-            start: float = -phi - theta
-            end: float = -phi + theta
+            t_x: float = float(t_xs[azimuth_step - 1])
+            t_r: float = float(t_rs[azimuth_step - 1])
+            start: float = float(starts[azimuth_step - 1])
+            end: float = float(ends[azimuth_step - 1])
+            start2: float = float(start2s[azimuth_step - 1])
+            end2: float = float(end2s[azimuth_step - 1])
 
-            t_c: float = hypot(t_x, t_y)  # Distance from T to centre of the astrolabe
-            arg: float = (t_r ** 2 + t_c ** 2 - r_2 ** 2) / (2 * t_r * t_c)
-            if (arg >= 1) or (arg <= -1):
-                start2: float = start
-                end2: float = end
-            else:
-                theta: float = acos((t_r ** 2 + t_c ** 2 - r_2 ** 2) / (2 * t_r * t_c))
-                phi: float = atan2(t_x, -t_y)
-                start2: float = -phi - theta
-                end2: float = -phi + theta
+            # Angular offset by which labels are pulled inside the edge of the climate
+            label_pull_in: float = (r_2 / t_r) * 8 * unit_deg
 
             context.begin_path()
             context.arc(centre_x=t_x, centre_y=-t_y, radius=t_r,
                         arc_from=max(start, start2) - pi / 2, arc_to=min(end, end2) - pi / 2)
             context.stroke(line_width=0.5,
-                           color=theme['alt_az'])
+                           color=color_alt_az)
 
             context.set_font_style(bold=True)
-            context.set_color(theme['text'])
-            if hypot(t_x + t_r * sin(end), t_y + t_r * cos(end)) < 0.9 * r_2:
+            context.set_color(color_text)
+
+            # Evaluate the trig at the ends of the arc once, and reuse the values for both the bounds check
+            # and the text placement
+            x_end: float = t_x + t_r * _sin(end)
+            y_end: float = t_y + t_r * _cos(end)
+            if x_end ** 2 + y_end ** 2 < r_2_sq_09:
                 context.text(text=direction_start,
-                             x=t_x + t_r * sin(end), y=-t_y - t_r * cos(end),
+                             x=x_end, y=-y_end,
                              h_align=0, v_align=1, gap=unit_mm,
-                             rotation=end - 90 * unit_deg)
+                             rotation=end - quarter_turn)
             else:
+                psi_end: float = min(end, end2) - label_pull_in
                 context.text(text=direction_start,
-                             x=t_x + t_r * sin(min(end, end2) - (r_2 / t_r) * 8 * unit_deg),
-                             y=-t_y - t_r * cos(min(end, end2) - (r_2 / t_r) * 8 * unit_deg),
+                             x=t_x + t_r * _sin(psi_end),
+                             y=-t_y - t_r * _cos(psi_end),
                              h_align=0, v_align=0, gap=0,
-                             rotation=(min(end, end2) - (r_2 / t_r) * 8 * unit_deg))
+                             rotation=psi_end)
 
-            if hypot(t_x + t_r * sin(start), t_y + t_r * cos(start)) < 0.9 * r_2:
+            x_start: float = t_x + t_r * _sin(start)
+            y_start: float = t_y + t_r * _cos(start)
+            if x_start ** 2 + y_start ** 2 < r_2_sq_09:
                 context.text(text=direction_end,
-                             x=t_x + t_r * sin(start),
-                             y=-t_y - t_r * cos(start),
+                             x=x_start,
+                             y=-y_start,
                              h_align=0, v_align=1, gap=unit_mm,
-                             rotation=90 * unit_deg + start)
+                             rotation=quarter_turn + start)
             else:
+                psi_start: float = max(start, start2) + label_pull_in
                 context.text(text=direction_end,
-                             x=t_x + t_r * sin(max(start, start2) + (r_2 / t_r) * 8 * unit_deg),
-                             y=-t_y - t_r * cos(max(start, start2) + (r_2 / t_r) * 8 * unit_deg),
+                             x=t_x + t_r * _sin(psi_start),
+                             y=-t_y - t_r * _cos(psi_start),
                              h_align=0, v_align=0, gap=0,
-                             rotation=(max(start, start2) + (r_2 / t_r) * 8 * unit_deg))
+                             rotation=psi_start)
 
         context.text(text="N" if not is_southern else "S",
                      x=0, y=-horizon_centre + horizon_radius,
@@ -292,21 +327,41 @@ class Climate(BaseComponent):
                     return 180 * unit_deg
                 if arg >= 1:
                     return 0 * unit_deg
-                return acos(arg)
-
-            # Draw lines of unequal hours in turn
-            for h in range(1, 12):
-                for r in arange(max(r_5, horizon_radius - horizon_centre), r_2 + 0.05 * unit_mm, 0.5 * unit_mm):
-                    r0: float = r
-                    r1: float = min(r + 0.5 * unit_mm, r_2)
-                    theta0: float = theta_unequal_hours(r0)
-                    theta1: float = theta_unequal_hours(r1)
-                    psi0: float = theta0 + (360 * unit_deg - 2 * theta0) / 12 * h
-                    psi1: float = theta1 + (360 * unit_deg - 2 * theta1) / 12 * h
-                    context.begin_path()
-                    context.move_to(x=r0 * sin(psi0), y=-r0 * cos(psi0))
-                    context.line_to(x=r1 * sin(psi1), y=-r1 * cos(psi1))
-                    context.stroke(line_width=1, dotted=False, color=theme['lines'])
+                return _acos(arg)
+
+            # Sample the radii along the lines of unequal hours once, and evaluate <theta_unequal_hours> at
+            # every sampled radius in a single vectorized pass. The same table serves all eleven hour lines,
+            # whereas evaluating it inside the loop over hours would recompute each value 22 times over.
+            r0s: np.ndarray = np.arange(max(r_5, horizon_radius - horizon_centre), r_2 + 0.05 * unit_mm,
+                                        0.5 * unit_mm)
+            r1s: np.ndarray = np.minimum(r0s + 0.5 * unit_mm, r_2)
+
+            def theta_unequal_hours_arr(r: np.ndarray) -> np.ndarray:
+                arg: np.ndarray = (r ** 2 + horizon_centre ** 2 - horizon_radius ** 2) / (2 * r * horizon_centre)
+                return np.arccos(np.clip(arg, -1, 1))
+
+            theta0s: np.ndarray = theta_unequal_hours_arr(r0s)
+            theta1s: np.ndarray = theta_unequal_hours_arr(r1s)
+
+            # Compute the endpoints of every line segment of every hour line in a single vectorized pass,
+            # as 2D arrays of shape (hour, radius); the loop below then only emits the drawing commands
+            hours: np.ndarray = np.arange(1, 12)[:, np.newaxis]
+            psi0s: np.ndarray = theta0s[np.newaxis, :] + (360 * unit_deg - 2 * theta0s[np.newaxis, :]) / 12 * hours
+            psi1s: np.ndarray = theta1s[np.newaxis, :] + (360 * unit_deg - 2 * theta1s[np.newaxis, :]) / 12 * hours
+            x0s: np.ndarray = r0s * np.sin(psi0s)
+            y0s: np.ndarray = -r0s * np.cos(psi0s)
+            x1s: np.ndarray = r1s * np.sin(psi1s)
+            y1s: np.ndarray = -r1s * np.cos(psi1s)
+
+            # Draw lines of unequal hours in turn. Consecutive segments share their endpoints, so each hour
+            # line is emitted as a single polyline, passed as coordinate arrays, with one stroke per hour
+            # line rather than one per segment.
+            for h_index in range(11):
+                xs: np.ndarray = np.concatenate(([x0s[h_index, 0]], x1s[h_index]))
+                ys: np.ndarray = np.concatenate(([y0s[h_index, 0]], y1s[h_index]))
+                context.begin_path()
+                context.polyline_xy(xs=xs, ys=ys)
+                context.stroke(line_width=1, dotted=False, color=color_lines)
 
             # Label the unequal hours
             context.set_font_size(1.6)
@@ -317,7 +372,7 @@ class Climate(BaseComponent):
                 psi0: float = theta0 + (360 * unit_deg - 2 * theta0) / 12 * (pos + 0.5)
                 psi0 = (psi0 - 180 * unit_deg) * 0.95 + 180 * unit_deg
                 context.text(text=hr,
-                             x=r * sin(psi0), y=-r * cos(psi0),
+                             x=r * _sin(psi0), y=-r * _cos(psi0),
                              h_align=0, v_align=0, gap=unit_mm,
                              rotation=180 * unit_deg + psi0)
 
@@ -325,16 +380,16 @@ class Climate(BaseComponent):
         if settings['astrolabe_type'] != 'full':
             arc_size: float = 40 * unit_deg
             context.begin_path()
-            context.move_to(x=r_2 * sin(arc_size), y=r_2 * cos(arc_size))
+            context.move_to(x=r_2 * _sin(arc_size), y=r_2 * _cos(arc_size))
             context.arc(centre_x=0, centre_y=0,
                         radius=r_2 - 0.8 * unit_cm,
                         arc_from=90 * unit_deg - arc_size,
                         arc_to=90 * unit_deg + arc_size
                         )
-            context.line_to(x=-r_2 * sin(arc_size), y=r_2 * cos(arc_size))
+            context.line_to(x=-r_2 * _sin(arc_size), y=r_2 * _cos(arc_size))
             context.stroke(line_width=1, dotted=False)
 
-            context.circular_text(text="{}:".format(text[language]['name']),
+            context.circular_text(text="{}:".format(text_lang['name']),
                                   centre_x=0, centre_y=0,
                                   radius=r_2 - 0.4 * unit_cm,
                                   azimuth=238,
@@ -350,15 +405,16 @@ class Climate(BaseComponent):
 
         # Finish up
         context.set_font_style(bold=False)
-        context.circular_text(text=text[language]['url'],
-                              centre_x=0, centre_y=0, radius=r_2 - 1.6 * unit_cm,
-                              azimuth=270, spacing=1, size=0.7)
-        context.circular_text(text=text[language]['copyright'],
-                              centre_x=0, centre_y=0, radius=r_2 - 1.3 * unit_cm,
-                              azimuth=270, spacing=1, size=0.7)
-        context.circular_text(text=text[language]['climate_latitude'].format(latitude, "N" if not is_southern else "S"),
-                              centre_x=0, centre_y=0, radius=r_2 - 1.0 * unit_cm,
-                              azimuth=270, spacing=1, size=0.7)
+        context.circular_text_batch(
+            items=[
+                {'text': text_lang['url'],
+                 'radius': r_2 - 1.6 * unit_cm, 'size': 0.7},
+                {'text': text_lang['copyright'],
+                 'radius': r_2 - 1.3 * unit_cm, 'size': 0.7},
+                {'text': text_lang['climate_latitude'].format(latitude, "N" if not is_southern else "S"),
+                 'radius': r_2 - 1.0 * unit_cm, 'size': 0.7}
+            ],
+            centre_x=0, centre_y=0, azimuth=270, spacing=1)
 
 
 # Do it right away if we're run as a script
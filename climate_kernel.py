@@ -0,0 +1,143 @@
+# climate_kernel.py
+# -*- coding: utf-8 -*-
+#
+# The python script in this file makes the various parts of a model astrolabe.
+#
+# Copyright (C) 2010-2024 Dominic Ford <https://dcford.org.uk/>
+#
+# This code is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# You should have received a copy of the GNU General Public License along with
+# this file; if not, write to the Free Software Foundation, Inc., 51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+# ----------------------------------------------------------------------------
+
+"""
+Numerical kernels used when rendering the climate of the astrolabe. These are pure geometry -- no drawing
+calls -- so they are kept separate from <climate.py>, where numba can JIT-compile them when it is installed.
+"""
+
+from math import pi, sqrt, acos, atan2, tan
+from typing import Tuple
+
+import numpy as np
+
+# numba is an optional dependency; when it is not installed, the kernels below run as ordinary Python
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        def wrapper(func):
+            return func
+
+        return wrapper
+
+
+@njit(cache=True)
+def compute_altitude_arcs(latitude_rad: float, r_4: float,
+                          half_angles: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Project the circles of constant altitude onto the climate, for all altitudes at once.
+
+    The maths used here is described in this paper: http://adsabs.harvard.edu/abs/1976JBAA...86..125E
+
+    :param latitude_rad:
+        The latitude of the observer, radians
+    :param r_4:
+        The radius of the line denoting the equator
+    :param half_angles:
+        The angular radius of each circle of constant altitude on the celestial sphere, radians
+    :return:
+        Arrays of the lower (y_a) and upper (y_b) intersections of each circle with the meridian
+    """
+
+    theta1: np.ndarray = -latitude_rad - half_angles
+    theta2: np.ndarray = -latitude_rad + half_angles
+
+    x1: np.ndarray = r_4 * np.sin(theta1)
+    y1: np.ndarray = r_4 * np.cos(theta1)
+    x2: np.ndarray = r_4 * np.sin(theta2)
+    y2: np.ndarray = r_4 * np.cos(theta2)
+
+    y_a: np.ndarray = y1 * (r_4 / (r_4 - x1))
+    y_b: np.ndarray = y2 * (r_4 / (r_4 - x2))
+
+    return y_a, y_b
+
+
+# The azimuths of the arcs of constant azimuth -- 16 arcs at 11.25 degree intervals -- are compile-time
+# constants, so their tangents are tabulated once at import time rather than evaluated on every render
+azimuth_table: np.ndarray = np.array([(-90 + 11.25 * k) * (pi / 180) for k in range(1, 16)])
+tan_azimuth_table: np.ndarray = np.array([tan(azimuth) for azimuth in azimuth_table])
+
+
+@njit(cache=True)
+def compute_azimuth_arcs(z_y: float, t_y: float, horizon_centre: float, horizon_radius: float,
+                         r_2: float
+                         ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compute the centres, radii and angular extents of the arcs of constant azimuth.
+
+    :param z_y:
+        The y coordinate of the zenith
+    :param t_y:
+        The y coordinate of the centres of the arcs of constant azimuth
+    :param horizon_centre:
+        The y coordinate of the centre of the arc denoting the horizon
+    :param horizon_radius:
+        The radius of the arc denoting the horizon
+    :param r_2:
+        The outer radius of the climate
+    :return:
+        Arrays of the x coordinate of the centre, the radius, and the angular extents (start, end) of each
+        arc, together with the angles (start2, end2) where each arc leaves the edge of the climate
+    """
+
+    step_count: int = tan_azimuth_table.size
+    t_xs: np.ndarray = np.empty(step_count)
+    t_rs: np.ndarray = np.empty(step_count)
+    starts: np.ndarray = np.empty(step_count)
+    ends: np.ndarray = np.empty(step_count)
+    start2s: np.ndarray = np.empty(step_count)
+    end2s: np.ndarray = np.empty(step_count)
+
+    r_2_sq: float = r_2 ** 2
+
+    for i in range(step_count):
+        t_x: float = (z_y - t_y) * tan_azimuth_table[i]
+        t_x_sq: float = t_x ** 2
+
+        # Radius of arc of constant azimuth. The squared distances are kept alongside the distances
+        # themselves, since the cosine-rule arguments below need the squares anyway.
+        t_r_sq: float = t_x_sq + (t_y - z_y) ** 2
+        t_r: float = sqrt(t_r_sq)
+
+        t_hc_sq: float = t_x_sq + (t_y - horizon_centre) ** 2  # Squared distance from T to centre of horizon
+        theta: float = acos((t_r_sq + t_hc_sq - horizon_radius ** 2) / (2 * t_r * sqrt(t_hc_sq)))
+        phi: float = atan2(t_x, horizon_centre - t_y)
+        start: float = -phi - theta
+        end: float = -phi + theta
+
+        t_c_sq: float = t_x_sq + t_y ** 2  # Squared distance from T to centre of the astrolabe
+        arg: float = (t_r_sq + t_c_sq - r_2_sq) / (2 * t_r * sqrt(t_c_sq))
+
+        # Clamp the cosine-rule argument rather than branching on it. When the arc does not meet the edge of
+        # the climate the clamped acos saturates to 0 or pi, and the resulting (start2, end2) interval always
+        # contains (start, end), so the max/min in the caller draws the same arc as before.
+        theta = acos(-1.0 if arg <= -1 else (1.0 if arg >= 1 else arg))
+        phi = atan2(t_x, -t_y)
+        start2: float = -phi - theta
+        end2: float = -phi + theta
+
+        t_xs[i] = t_x
+        t_rs[i] = t_r
+        starts[i] = start
+        ends[i] = end
+        start2s[i] = start2
+        end2s[i] = end2
+
+    return t_xs, t_rs, starts, ends, start2s, end2s
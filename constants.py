@@ -20,7 +20,7 @@
 The file contains global settings for the astrolabe.
 """
 
-from math import pi
+from math import pi, sin, cos, tan
 
 # Units
 dots_per_inch: float = 200
@@ -54,3 +54,11 @@ centre_scaling: float = 1 / 2.5 * 0.6
 
 # Inclination of the ecliptic
 inclination_ecliptic: float = 23.5
+
+# Trig values which are needed on every render, but whose inputs never change, computed once at import time
+sin_tab_size: float = sin(tab_size)
+cos_tab_size: float = cos(tab_size)
+
+# The ratio of the radius of the equator to the radius of the tropic of Capricorn (and likewise of the tropic
+# of Cancer to the equator), under stereographic projection
+r4_over_r2: float = tan((90 - inclination_ecliptic) / 2 * unit_deg)
@@ -0,0 +1,62 @@
+# geom_kernels.py
+# -*- coding: utf-8 -*-
+#
+# The python script in this file makes the various parts of a model astrolabe.
+#
+# Copyright (C) 2010-2024 Dominic Ford <https://dcford.org.uk/>
+#
+# This code is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# You should have received a copy of the GNU General Public License along with
+# this file; if not, write to the Free Software Foundation, Inc., 51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+# ----------------------------------------------------------------------------
+
+"""
+Shared numerical kernels for projecting points onto the astrolabe. These are pure geometry -- no drawing
+calls -- so that numba can JIT-compile them when it is installed, as in <climate_kernel.py>.
+"""
+
+from math import pi
+from typing import Tuple
+
+import numpy as np
+
+# numba is an optional dependency; when it is not installed, the kernels below run as ordinary Python
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        def wrapper(func):
+            return func
+
+        return wrapper
+
+
+@njit(cache=True)
+def project_stereographic(ra: np.ndarray, dec: np.ndarray, r_4: float
+                          ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Project (RA, Dec) positions onto the plane of the astrolabe, by stereographic projection from the
+    southern celestial pole, for whole arrays of points at once.
+
+    :param ra:
+        The right ascensions of the points, degrees
+    :param dec:
+        The declinations of the points, degrees
+    :param r_4:
+        The radius of the line denoting the equator
+    :return:
+        Arrays of the radius of each point from the centre of the astrolabe, and its (x, y) position
+    """
+
+    r: np.ndarray = r_4 * np.tan((90.0 - dec) * (pi / 360.0))
+    ra_rad: np.ndarray = ra * (pi / 180.0)
+    x: np.ndarray = r * np.cos(ra_rad)
+    y: np.ndarray = -r * np.sin(ra_rad)
+
+    return r, x, y
@@ -21,14 +21,32 @@ A thin wrapper to produce vector graphics using cairo.
 """
 
 import logging
+import os
+import shutil
+import subprocess
+
+from contextlib import contextmanager
 
 from math import pi, sin, cos
 
-from typing import Dict, List, Optional, Sequence, Union
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
 
 import cairocffi as cairo
+import numpy as np
 from constants import unit_deg, unit_mm, font_size_base, line_width_base, dots_per_inch
 
+logger = logging.getLogger(__name__)
+
+# Decoded PNG images, keyed by filename and modification time, so that an image reused across many pages
+# (logos, symbols) is only parsed and inflated once per process. FIFO-evicted once it grows beyond a few
+# dozen images.
+_png_surface_cache: Dict[Tuple[str, float], "cairo.ImageSurface"] = {}
+_png_surface_cache_size: int = 32
+
+# Dash patterns for dotted and solid strokes, allocated once rather than per style change
+_dash_dotted: Tuple[float] = (1.0 * unit_mm,)
+_dash_solid: Tuple = ()
+
 
 class GraphicsPage:
     """
@@ -36,12 +54,25 @@ class GraphicsPage:
     to draw onto.
     """
 
+    # The surface constructor for each output format we can produce, keyed by format name. The
+    # "recording" format is internal -- an off-screen surface used to replay one rendering onto several
+    # output surfaces -- and so is not included in <supported_formats>.
+    _surface_factories: Dict[str, Callable] = {
+        "pdf": lambda page: cairo.PDFSurface(page.output, page.width, page.height),
+        "png": lambda page: cairo.ImageSurface(
+            cairo.FORMAT_ARGB32 if page.has_alpha else cairo.FORMAT_RGB24, page.width, page.height),
+        "svg": lambda page: cairo.SVGSurface(page.output, page.width, page.height),
+        "recording": lambda page: cairo.RecordingSurface(cairo.CONTENT_COLOR_ALPHA,
+                                                         (0, 0, page.width, page.height)),
+    }
+
     def __init__(self,
                  img_format: str = "png",
                  output: str = "page",
                  width: float = 0.15,
                  height: float = 0.15,
-                 dots_per_inch: float = dots_per_inch):
+                 dots_per_inch: float = dots_per_inch,
+                 has_alpha: bool = True):
         """
         A thin wrapper to produce vector graphics using cairo. This class represents a page / image file we are going
         to draw onto.
@@ -56,60 +87,89 @@ class GraphicsPage:
             The height of the page, metres
         :param dots_per_inch:
             The dots per inch resolution to render this page
+        :param has_alpha:
+            Whether PNG output needs an alpha channel. Pages whose contents are fully opaque can pass
+            False, which spares cairo the per-pixel alpha compositing work while rasterizing.
         """
 
         # PDF surfaces are always measured in points
-        if img_format in ("pdf", "svg"):
+        if img_format in ("pdf", "svg", "recording"):
             dots_per_inch = 72.
 
         self.format: str = img_format
-        self.output: str = "{}.{}".format(output, img_format)
+        self.output: str = f"{output}.{img_format}"
         self.dots_per_metre: float = dots_per_inch * 39.370079
         self.width: int = int(width * self.dots_per_metre)  # pixels
         self.height: int = int(height * self.dots_per_metre)  # pixels
+        self.has_alpha: bool = has_alpha
 
-        self.surface: Optional[cairo.Surface] = None
-        if self.format == "pdf":
-            self.surface = cairo.PDFSurface(self.output, self.width, self.height)
-        elif self.format == "png":
-            self.surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, self.width, self.height)
-        elif self.format == "svg":
-            self.surface = cairo.SVGSurface(self.output, self.width, self.height)
-        else:
-            assert False, "Unknown image output format {}".format(self.format)
+        # A real exception, rather than an assert, so the check survives running under -O
+        if self.format not in self._surface_factories:
+            raise ValueError("Unknown image output format {}".format(self.format))
 
-    def __del__(self) -> None:
+        # The cairo surface is created lazily on first access, so that pages which are sized up but never
+        # drawn onto do not allocate surfaces or open output file handles
+        self._surface: Optional[cairo.Surface] = None
+
+    @property
+    def surface(self) -> cairo.Surface:
+        """
+        The cairo surface that this page draws onto, created on first access.
         """
-        Save the canvas we have drawn to disk
+        if self._surface is None:
+            self._surface = self._surface_factories[self.format](self)
+        return self._surface
+
+    def close(self) -> None:
+        """
+        Save the canvas we have drawn to disk. Calling <surface.finish> here explicitly flushes cairo's
+        output to disk deterministically, so that by the time we return, the image file is guaranteed to be
+        complete and safe for other processes (e.g. pdflatex) to read.
 
         :return:
             None
         """
 
-        # Protect against being called twice
-        if self.surface is None:
+        # Nothing to finalize if the surface was never materialized, or if we have already been called
+        if self._surface is None:
             return
 
-        logging.info("Creating file <{}>".format(self.output))
+        # Recording surfaces are off-screen; there is no file to write
+        if self.format == "recording":
+            self._surface.finish()
+            self._surface = None
+            return
 
-        if self.format == "pdf":
-            self.surface.show_page()
-        elif self.format == "png":
-            self.surface.write_to_png(self.output)
-        elif self.format == "svg":
-            self.surface.show_page()
-        else:
-            assert False, "Unknown image output format {}".format(self.format)
+        logger.debug("Creating file <%s>", self.output)
+
+        # Bitmap surfaces need writing out explicitly; for pdf/svg, <finish> below emits the final page
+        # itself, so a separate <show_page> call would be redundant
+        if self.format == "png":
+            self._surface.write_to_png(self.output)
 
         # Clean up
-        self.surface.finish()
-        self.surface = None
+        self._surface.finish()
+        self._surface = None
+
+    def __del__(self) -> None:
+        """
+        Pages must be finalized explicitly, via <close> or by using the page as a context manager.
+        Writing the output from a finalizer would happen at an unpredictable time -- or, at interpreter
+        shutdown, possibly not at all -- so a page that was drawn on but never closed is a bug, and is
+        only warned about here rather than silently rescued.
+
+        :return:
+            None
+        """
+        if self._surface is not None:
+            logger.warning("GraphicsPage <%s> was never closed; its output has not been written",
+                           self.output)
 
     def __enter__(self):
         return self
 
     def __exit__(self, err_type, err_value, err_tb):
-        self.__del__()
+        self.close()
 
     @staticmethod
     def supported_formats() -> Sequence[str]:
@@ -132,7 +192,8 @@ class GraphicsContext:
         draw a figure onto a page.
 
         :param page:
-            The GraphicsPage we are going to draw onto
+            The GraphicsPage we are going to draw onto. Anything without a page-like surface and
+            resolution fails as soon as the cairo context is created below.
         :param offset_x:
             The offset of this drawing from (0,0) on the page, metres
         :param offset_y:
@@ -141,8 +202,6 @@ class GraphicsContext:
             The rotation of this drawing, radians
         """
 
-        assert isinstance(page, GraphicsPage)
-
         # Record our drawing state
         self.base_line_width: float = line_width_base
         self.base_font_size: float = font_size_base
@@ -151,11 +210,34 @@ class GraphicsContext:
         self.font_italic: bool = False
         self.line_dotted: bool = False
 
+        # Cache of text-extents measurements, keyed by font settings and string, so that repeated
+        # measurements of the same label are served without a round trip into cairo
+        self._text_extents_cache: Dict[Tuple[float, bool, bool, str],
+                                       Tuple[float, float, float, float, float, float]] = {}
+
+        # Cached font-wide metrics, invalidated whenever the font size or style changes
+        self._font_metrics: Optional[Tuple[float, float, float, float, float]] = None
+
+        # The (italic, bold) style last selected into cairo, so that redundant font-face selections can
+        # be skipped; None until the first selection is made
+        self._font_face_style: Optional[Tuple[bool, bool]] = None
+
+        # Likewise the last line width and dash pattern set into cairo, so that the setters can skip
+        # re-asserting unchanged state
+        self._last_line_width: Optional[float] = None
+        self._last_dotted: Optional[bool] = None
+
+        # The transformation matrix captured by <matrix_transformation_set>
+        self._saved_matrix: Optional[cairo.Matrix] = None
+
         # Create Cairo context with default settings for requested canvas
         self.context: cairo.Context = cairo.Context(target=page.surface)
         self.context.scale(sx=page.dots_per_metre, sy=page.dots_per_metre)
-        self.context.translate(tx=offset_x, ty=offset_y)
-        self.context.rotate(radians=rotation * unit_deg)
+        # Skip the matrix multiplies when the transforms are identity, as they are for most pages
+        if offset_x or offset_y:
+            self.context.translate(tx=offset_x, ty=offset_y)
+        if rotation:
+            self.context.rotate(radians=rotation * unit_deg)
         self.set_line_width(line_width=1)
         self.set_font_style()
         self.set_font_size(font_size=1)
@@ -232,6 +314,121 @@ class GraphicsContext:
         """
         self.context.close_path()
 
+    def radial_ticks(self, centre_x: float, centre_y: float, r_inner: float, r_outer: float,
+                     angles: Sequence[float]) -> None:
+        """
+        Add a whole ring of radial tick marks to the current path, in a single pass.
+
+        The endpoints of all the ticks are computed with one pair of vectorized trig calls, rather than
+        evaluating scalar sin/cos twice per tick, and the path-building calls are bound once.
+
+        :param centre_x:
+            The centre of the ring of ticks, metres
+        :param centre_y:
+            The centre of the ring of ticks, metres
+        :param r_inner:
+            The radius at which each tick starts, metres
+        :param r_outer:
+            The radius at which each tick ends, metres
+        :param angles:
+            The angles of the ticks, radians
+        :return:
+            None
+        """
+        angles = np.asarray(angles)
+        cos_angles: np.ndarray = np.cos(angles)
+        sin_angles: np.ndarray = np.sin(angles)
+        x_inner: np.ndarray = centre_x + r_inner * cos_angles
+        y_inner: np.ndarray = centre_y + r_inner * sin_angles
+        x_outer: np.ndarray = centre_x + r_outer * cos_angles
+        y_outer: np.ndarray = centre_y + r_outer * sin_angles
+
+        move_to = self.context.move_to
+        line_to = self.context.line_to
+        for i in range(angles.size):
+            move_to(x=x_outer[i], y=y_outer[i])
+            line_to(x=x_inner[i], y=y_inner[i])
+
+    def draw_markers(self, xs: np.ndarray, ys: np.ndarray, radii: np.ndarray,
+                     color: Optional[Sequence[float]] = None) -> None:
+        """
+        Draw a set of filled circular markers in a single batch: one path containing a circular sub-path
+        per marker, filled with one fill call, rather than a begin_path / circle / fill round trip per
+        marker.
+
+        :param xs:
+            The x coordinates of the marker centres, metres
+        :param ys:
+            The y coordinates of the marker centres, metres
+        :param radii:
+            The radius of each marker, metres
+        :param color:
+            The colour to fill the markers with
+        :return:
+            None
+        """
+        self.begin_path()
+        new_sub_path = self.context.new_sub_path
+        arc = self.context.arc
+        two_pi: float = 2 * pi
+        for i in range(len(xs)):
+            new_sub_path()
+            arc(xc=xs[i], yc=ys[i], radius=radii[i], angle1=0, angle2=two_pi)
+
+        # Overlapping markers must fill as their union, which the context's even-odd fill rule would
+        # instead turn into holes; switch to the winding rule for the duration of this fill
+        self.context.save()
+        self.context.set_fill_rule(fill_rule=cairo.FILL_RULE_WINDING)
+        self.fill(color=color)
+        self.context.restore()
+
+    def polyline(self, points: Sequence[Tuple[float, float]], closed: bool = False) -> None:
+        """
+        Add a line connecting a whole series of points to the current path, in a single pass.
+
+        Feeding a long line through <move_to> / <line_to> costs a Python-level method call per vertex; here
+        the underlying cairo calls are bound once and the vertex list walked in a tight loop.
+
+        :param points:
+            A list of (x, y) points to connect, metres
+        :param closed:
+            Boolean flag indicating whether to close the path back to the first point
+        :return:
+            None
+        """
+        line_to = self.context.line_to
+        self.context.move_to(x=points[0][0], y=points[0][1])
+        for x, y in points[1:]:
+            line_to(x=x, y=y)
+        if closed:
+            self.context.close_path()
+
+    def polyline_xy(self, xs: np.ndarray, ys: np.ndarray, closed: bool = False) -> None:
+        """
+        Add a line connecting a whole series of points to the current path, taking the vertices as a pair
+        of coordinate arrays.
+
+        This is the array-based companion to <polyline>: callers whose vertices already live in numpy
+        arrays can pass them straight through, without first packing them into a list of (x, y) tuples.
+        Building a cairo path structure in one memcpy would need cairocffi's private FFI handles, which is
+        not portable across the cairo bindings, so the vertices are walked with a bound <line_to> instead.
+
+        :param xs:
+            The x coordinates of the points to connect, metres
+        :param ys:
+            The y coordinates of the points to connect, metres
+        :param closed:
+            Boolean flag indicating whether to close the path back to the first point
+        :return:
+            None
+        """
+        line_to = self.context.line_to
+        self.context.move_to(x=xs[0], y=ys[0])
+        for i in range(1, len(xs)):
+            line_to(x=xs[i], y=ys[i])
+        if closed:
+            self.context.close_path()
+
     def stroke(self, line_width: Optional[float] = None,
                color: Optional[Sequence[float]] = None, dotted: Optional[bool] = None) -> None:
         """
@@ -276,10 +473,13 @@ class GraphicsContext:
         """
         self.context.arc(xc=centre_x, yc=centre_y, radius=radius, angle1=arc_from, angle2=arc_to)
 
-    def circle(self, centre_x: float, centre_y: float, radius: float) -> None:
+    def circle(self, centre_x: float, centre_y: float, radius: float, _two_pi: float = 2 * pi) -> None:
         """
         Add an arc element to the current path.
 
+        The trailing underscore argument binds a constant at function-definition time, sparing a global
+        lookup on each of the many calls made per render; it is not part of the public signature.
+
         :param centre_x:
             The centre of the circles, metres
         :param centre_y:
@@ -287,7 +487,7 @@ class GraphicsContext:
         :param radius:
             The radius of the circles, metres
         """
-        self.arc(centre_x=centre_x, centre_y=centre_y, radius=radius, arc_from=0, arc_to=2 * pi)
+        self.arc(centre_x=centre_x, centre_y=centre_y, radius=radius, arc_from=0, arc_to=_two_pi)
 
     def rectangle(self, x0: float, y0: float, x1: float, y1: float) -> None:
         """
@@ -327,10 +527,12 @@ class GraphicsContext:
         if dotted is not None:
             self.line_dotted = dotted
 
-        if self.line_dotted:
-            self.context.set_dash([1.0 * unit_mm])
-        else:
-            self.context.set_dash([])
+        # Skip the FFI call when the dash pattern is not actually changing
+        if self.line_dotted == self._last_dotted:
+            return
+        self._last_dotted = self.line_dotted
+
+        self.context.set_dash(_dash_dotted if self.line_dotted else _dash_solid)
 
     def set_font_size(self, font_size: float) -> None:
         """
@@ -339,7 +541,11 @@ class GraphicsContext:
         :param font_size:
             Font size, relative to default
         """
+        # Skip the FFI call when the font size is not actually changing
+        if font_size == self.font_size:
+            return
         self.font_size = font_size
+        self._font_metrics = None
         self.context.set_font_size(font_size * self.base_font_size)
 
     def set_font_style(self, italic: Optional[bool] = None, bold: Optional[bool] = None) -> None:
@@ -356,11 +562,46 @@ class GraphicsContext:
         if bold is not None:
             self.font_bold = bold
 
+        # Skip the select_font_face FFI call when the effective style is not actually changing
+        if (self.font_italic, self.font_bold) == self._font_face_style:
+            return
+        self._font_face_style = (self.font_italic, self.font_bold)
+
+        self._font_metrics = None
         self.context.select_font_face(family="FreeSerif",
                                       slant=cairo.FONT_SLANT_ITALIC if self.font_italic else cairo.FONT_SLANT_NORMAL,
-                                      weight=cairo.FONT_WEIGHT_BOLD if self.font_bold else cairo.FONT_SLANT_NORMAL
+                                      weight=cairo.FONT_WEIGHT_BOLD if self.font_bold else cairo.FONT_WEIGHT_NORMAL
                                       )
 
+    @contextmanager
+    def font(self, size: Optional[float] = None,
+             bold: Optional[bool] = None, italic: Optional[bool] = None):
+        """
+        Context manager which selects font settings on entry, and restores the previous settings on exit.
+        Callers drawing many identically-styled labels can set the font once around the whole loop,
+        instead of re-asserting it per label.
+
+        :param size:
+            Font size, relative to default. None indicates we preserve the existing setting.
+        :param bold:
+            Boolean flag, indicating whether text should be bold. None indicates we preserve the existing setting.
+        :param italic:
+            Boolean flag, indicating whether text should be italic. None indicates we preserve the existing setting.
+        """
+        previous_size: Optional[float] = self.font_size
+        previous_bold: bool = self.font_bold
+        previous_italic: bool = self.font_italic
+
+        if size is not None:
+            self.set_font_size(font_size=size)
+        if (bold is not None) or (italic is not None):
+            self.set_font_style(italic=italic, bold=bold)
+        try:
+            yield self
+        finally:
+            self.set_font_size(font_size=previous_size)
+            self.set_font_style(italic=previous_italic, bold=previous_bold)
+
     def set_line_width(self, line_width: float) -> None:
         """
         Sets the line width used to stroke paths.
@@ -370,7 +611,13 @@ class GraphicsContext:
         :return:
             None
         """
-        self.context.set_line_width(width=line_width * self.base_line_width)
+        # Skip the FFI call when the line width is not actually changing; stroke() re-asserts the same
+        # width on almost every call
+        width: float = line_width * self.base_line_width
+        if width == self._last_line_width:
+            return
+        self._last_line_width = width
+        self.context.set_line_width(width=width)
 
     def text(self, text: str, x: float, y: float,
              h_align: int = 0, v_align: int = 0,
@@ -396,7 +643,8 @@ class GraphicsContext:
             None
         """
 
-        text: str = str(text)
+        if not isinstance(text, str):
+            text = str(text)
         extent: Dict[str, float] = self.measure_text(text=text)
 
         # Cairo places top-left of text at specified point. For other alignments, we calculate where this point will be
@@ -411,13 +659,20 @@ class GraphicsContext:
         if v_align > 0:
             offset_y += extent['height'] / 2
 
-        # Now draw text
-        self.context.save()
-        self.context.translate(tx=x, ty=y)
-        self.context.rotate(radians=rotation)
-        self.context.move_to(x=offset_x + gap * h_align, y=offset_y + gap * v_align)
-        self.context.show_text(text=text)
-        self.context.restore()
+        # Now draw text. Unrotated text needs no transformation of the canvas at all, so the common case
+        # skips the save / translate / rotate / restore round trips and positions the text directly.
+        if rotation == 0:
+            self.context.move_to(x=x + offset_x + gap * h_align, y=y + offset_y + gap * v_align)
+            self.context.show_text(text=text)
+        else:
+            # Rotated text only mutates the transformation matrix, so capture and put back just that,
+            # rather than snapshotting the full graphics state with save/restore
+            previous_matrix: cairo.Matrix = self.context.get_matrix()
+            self.context.translate(tx=x, ty=y)
+            self.context.rotate(radians=rotation)
+            self.context.move_to(x=offset_x + gap * h_align, y=offset_y + gap * v_align)
+            self.context.show_text(text=text)
+            self.context.set_matrix(previous_matrix)
 
     def measure_text(self, text: str) -> Dict[str, float]:
         """
@@ -429,8 +684,21 @@ class GraphicsContext:
             Dictionary of size information about the text string
         """
 
-        # Measure text
-        (x, y, width, height, dx, dy) = self.context.text_extents(text=text)
+        # Serve repeated measurements from the cache; the extents depend on the font settings as well as
+        # the string itself, so those form part of the key
+        key: Tuple[float, bool, bool, str] = (self.font_size, self.font_bold, self.font_italic, text)
+        extents: Optional[Tuple[float, float, float, float, float, float]] = self._text_extents_cache.get(key)
+
+        if extents is None:
+            # Measure text
+            extents = self.context.text_extents(text=text)
+
+            # Bound the size of the cache, evicting the oldest entry once it is full
+            if len(self._text_extents_cache) >= 4096:
+                self._text_extents_cache.pop(next(iter(self._text_extents_cache)))
+            self._text_extents_cache[key] = extents
+
+        (x, y, width, height, dx, dy) = extents
 
         # Return dimensions
         return {
@@ -442,6 +710,29 @@ class GraphicsContext:
             "dy": dy
         }
 
+    def font_metrics(self) -> Dict[str, float]:
+        """
+        Report the metrics of the currently-selected font -- ascent, descent, line height and maximum glyph
+        advances. Unlike <measure_text>, these depend only on the font settings, not on any particular
+        string, so they are fetched from cairo once per font selection and cached until the font changes.
+
+        :return:
+            Dictionary of size information about the current font
+        """
+
+        if self._font_metrics is None:
+            self._font_metrics = self.context.font_extents()
+
+        (ascent, descent, height, max_x_advance, max_y_advance) = self._font_metrics
+
+        return {
+            "ascent": ascent,
+            "descent": descent,
+            "height": height,
+            "max_x_advance": max_x_advance,
+            "max_y_advance": max_y_advance
+        }
+
     def circular_text(self, text: str, centre_x: float, centre_y: float,
                       radius: float, azimuth: float, spacing: float, size: float) -> None:
         """
@@ -465,30 +756,96 @@ class GraphicsContext:
             None
         """
 
-        self.set_font_size(size)
+        self.circular_text_batch(items=[{'text': text, 'radius': radius, 'size': size}],
+                                 centre_x=centre_x, centre_y=centre_y, azimuth=azimuth, spacing=spacing)
 
-        # First calculate total length of text
-        text_width: float = 0
-        for char in text:
-            text_width += float(self.measure_text(text=char)['dx']) * 1.1
+    def circular_text_batch(self, items: Sequence[Dict[str, Union[str, float]]],
+                            centre_x: float, centre_y: float, azimuth: float, spacing: float,
+                            _u: float = unit_deg) -> None:
+        """
+        Write several text strings around concentric circular paths, sharing a common centre and azimuth.
 
-        # Work out the angular span of the text around the specified circular path
-        text_angular_width: float = text_width / radius
+        Each string's characters are measured exactly once here, with the measurements reused for both
+        centering the string and stepping along the circular path, rather than measuring each character a
+        second time while rendering.
 
-        # Work out the azimuth at which we need to start, in order to have centre of text at specified azimuth
-        current_azimuth: float = azimuth * unit_deg - spacing * text_angular_width / 2
+        :param items:
+            A list of dictionaries, one per string, with the elements 'text', 'radius' and 'size'
+        :param centre_x:
+            The horizontal position of the centre of the circles we are to write the text around
+        :param centre_y:
+            The vertical position of the centre of the circles we are to write the text around
+        :param azimuth:
+            The angle, in degrees, where each text string is to be centred. Measured clockwise from straight up.
+        :param spacing:
+            The spacing between the letters.
+        :return:
+            None
+        """
 
-        # Then render text, one character at a time
-        for char in text:
-            dimensions: Dict[str, float] = self.measure_text(text=char)
-            character_width: float = float(dimensions['dx']) * 1.1
-            self.text(text=char,
-                      x=centre_x + cos(current_azimuth) * radius,
-                      y=centre_y - sin(current_azimuth) * radius,
-                      h_align=-1, v_align=-1,
-                      rotation=-current_azimuth - 90 * unit_deg
-                      )
-            current_azimuth += (character_width * spacing) / radius
+        # (_u binds unit_deg at function-definition time, sparing a global lookup per call)
+
+        # Bind the cairo context's methods as locals, so that the per-glyph loop below does not re-resolve
+        # the same attributes on every character
+        translate = self.context.translate
+        rotate = self.context.rotate
+        move_to = self.context.move_to
+        show_text = self.context.show_text
+        show_glyphs = self.context.show_glyphs
+        set_matrix = self.context.set_matrix
+
+        # Each glyph placement only mutates the transformation matrix, so putting back the matrix
+        # captured here is enough to undo it -- no full save/restore snapshot per glyph
+        base_matrix: cairo.Matrix = self.context.get_matrix()
+
+        for item in items:
+            text: str = str(item['text'])
+            radius: float = item['radius']
+
+            self.set_font_size(item['size'])
+
+            # Measure each distinct character once, and calculate total length of text. Strings full of
+            # repeated glyphs (numerals, tick labels) only pay for one measurement per glyph.
+            # The advance returned by <measure_text> is already a Python float; no coercion needed
+            advance_by_char: Dict[str, float] = {}
+            for char in text:
+                if char not in advance_by_char:
+                    advance_by_char[char] = self.measure_text(text=char)['dx'] * 1.1
+            character_widths: List[float] = [advance_by_char[char] for char in text]
+
+            # Work out the angular span of the text around the specified circular path
+            text_angular_width: float = sum(character_widths) / radius
+
+            # Work out the azimuth at which we need to start, in order to have centre of text at specified azimuth
+            start_azimuth: float = azimuth * _u - spacing * text_angular_width / 2
+
+            # Lay out all the glyphs in one vectorized pass: each glyph's azimuth is the running total of
+            # the preceding glyph widths, scaled onto the circular path, and the glyph positions follow
+            # from a single pair of array trig calls
+            azimuth_steps: np.ndarray = np.asarray(character_widths) * (spacing / radius)
+            glyph_azimuths: np.ndarray = start_azimuth + (np.cumsum(azimuth_steps) - azimuth_steps)
+            glyph_x: np.ndarray = centre_x + np.cos(glyph_azimuths) * radius
+            glyph_y: np.ndarray = centre_y - np.sin(glyph_azimuths) * radius
+            glyph_rotations: np.ndarray = -glyph_azimuths - 90 * _u
+
+            # Resolve the whole string to font glyph indices once, rather than letting show_text repeat
+            # the UTF-8 decoding and glyph lookup for every character. cairo's glyph conversion maps one
+            # code point to one glyph; should that ever not hold, fall back to show_text per character.
+            glyphs: list = self.context.get_scaled_font().text_to_glyphs(0, 0, text, with_clusters=False)
+            glyph_ids: Optional[list] = [glyph[0] for glyph in glyphs] if len(glyphs) == len(text) else None
+
+            # Then render text, one character at a time. The generic <text> method would re-measure each
+            # character only to discard the result for this alignment (top-left, no gap), so the placement
+            # is inlined here instead.
+            for i, char in enumerate(text):
+                translate(tx=glyph_x[i], ty=glyph_y[i])
+                rotate(radians=glyph_rotations[i])
+                if glyph_ids is not None:
+                    show_glyphs([(glyph_ids[i], 0, 0)])
+                else:
+                    move_to(x=0, y=0)
+                    show_text(text=char)
+                set_matrix(base_matrix)
 
     def text_wrapped(self, text: Union[str, Sequence], x: float, y: float, width: float,
                      justify: int = 0, line_spacing: float = 1.3,
@@ -522,25 +879,38 @@ class GraphicsContext:
         # Assemble a list of all the lines we are going to display
         line_buffer: List[str] = []
 
-        # Loop through each of the paragraphs of input text, one by one. They are supplied as a list or tuple.
+        # The width of each candidate line is accumulated incrementally from per-word measurements, rather
+        # than re-measuring the whole line every time a word is added, which cost quadratic work in the
+        # length of each paragraph. The sum of the word advances slightly overestimates the inked width of
+        # the assembled line, so a line is only broken after one full measurement confirms the overflow.
+        space_advance: float = self.measure_text(text=" ")['dx']
+
+        # Loop through each of the paragraphs of input text, one by one. They are supplied as a list or
+        # tuple. Each line is accumulated as a list of words and only joined into a string when it is
+        # flushed, rather than rebuilding an ever-longer line string after every word.
         for paragraph in text:
-            line: str = ""
+            parts: List[str] = []
+            line_width: float = 0
             # Add each word in turn to the current line, until it becomes too long
             for word in paragraph.split():
-                line_new = "{} {}".format(line, word).strip()
-                line_new_width = self.measure_text(line_new)['width']
-                # If the line is too long, start a new line
-                if line_new_width > width:
-                    line_buffer.append(line)
-                    line = word
+                word_advance: float = self.measure_text(text=word)['dx']
+                candidate_width: float = line_width + (space_advance if parts else 0) + word_advance
+                if candidate_width > width:
+                    # If the line really is too long, start a new line
+                    if self.measure_text(text=" ".join(parts + [word]))['width'] > width:
+                        line_buffer.append(" ".join(parts))
+                        parts = [word]
+                        line_width = word_advance
+                        continue
                 # Otherwise, keep adding words to the existing line
-                else:
-                    line = line_new
+                parts.append(word)
+                line_width = candidate_width
             # Add last line of text to buffer
-            line_buffer.append(line)
+            line_buffer.append(" ".join(parts))
 
-        line_heights: List[float] = [self.font_size * self.base_font_size * line_spacing for line in line_buffer]
-        total_height: float = sum(line_heights)
+        # Every line is the same height, so a single scalar stands in for the old per-line list
+        line_height: float = self.font_size * self.base_font_size * line_spacing
+        total_height: float = line_height * len(line_buffer)
 
         # Now draw text, line by line
         self.context.save()
@@ -557,9 +927,9 @@ class GraphicsContext:
         else:
             y_anchor = -total_height
 
-        for line_number, line in enumerate(line_buffer):
+        for line in line_buffer:
             self.text(text=line, x=x_anchor, y=y_anchor, h_align=justify, v_align=-1)
-            y_anchor += line_heights[line_number]
+            y_anchor += line_height
 
         self.context.restore()
 
@@ -582,11 +952,20 @@ class GraphicsContext:
             Boolean flag indicating whether the image was successfully rendered
         """
 
-        # Save the state of the display context
-        self.context.save()
+        # Only the transformation matrix and the source pattern are mutated below, so rather than pushing
+        # the whole graphics state (font, dash, clip) with save/restore, capture just those two
+        previous_matrix: cairo.Matrix = self.context.get_matrix()
+        previous_source = self.context.get_source()
         try:
-            # Create a Cairo image surface with the PNG image on it
-            image_surface: cairo.ImageSurface = cairo.ImageSurface.create_from_png(png_filename)
+            # Create a Cairo image surface with the PNG image on it, unless we already have this image
+            # decoded in the cache
+            cache_key: Tuple[str, float] = (png_filename, os.stat(png_filename).st_mtime)
+            image_surface: Optional[cairo.ImageSurface] = _png_surface_cache.get(cache_key)
+            if image_surface is None:
+                image_surface = cairo.ImageSurface.create_from_png(png_filename)
+                if len(_png_surface_cache) >= _png_surface_cache_size:
+                    _png_surface_cache.pop(next(iter(_png_surface_cache)))
+                _png_surface_cache[cache_key] = image_surface
 
             # Measure the PNG image
             img_height: int = image_surface.get_height()
@@ -604,11 +983,12 @@ class GraphicsContext:
             self.context.paint()
             outcome: bool = True
         except:
-            logging.info("Failed to render PNG image")
+            logger.info("Failed to render PNG image")
             outcome = False
 
         # Make sure that we undo the coordinate transformation, even if the image render fails
-        self.context.restore()
+        self.context.set_matrix(previous_matrix)
+        self.context.set_source(previous_source)
 
         # Return success flag
         return outcome
@@ -621,7 +1001,9 @@ class GraphicsContext:
         x_new = xx * x + xy * y + x0
         y_new = yx * x + yy * y + y0
         """
-        self.context.save()
+        # Only the transformation matrix changes here, so capturing it is enough; a full save would copy
+        # the whole graphics state
+        self._saved_matrix = self.context.get_matrix()
         self.context.translate(tx=centre_x, ty=centre_y)
         self.context.transform(cairo.Matrix(xx=xx, yx=yx, xy=xy, yy=yy, x0=x0, y0=y0))
 
@@ -629,7 +1011,7 @@ class GraphicsContext:
         """
         Undo a matrix transformation to the Cairo drawing context.
         """
-        self.context.restore()
+        self.context.set_matrix(self._saved_matrix)
 
 
 class BaseComponent:
@@ -649,12 +1031,34 @@ class BaseComponent:
             settings = {}
         self.settings: dict = settings
 
+        # Cached bounding box, computed on first use. Settings are frozen once a component is built, so
+        # the box never needs invalidating.
+        self._bounding_box: Optional[Dict[str, float]] = None
+
+    def get_bounding_box(self) -> Dict[str, float]:
+        """
+        Return the bounding box of this component, computing it on first call and serving the cached
+        result thereafter. Callers should use this in preference to calling <bounding_box> directly.
+
+        :return:
+            Dictionary with the elements 'x_min', 'x_max', 'y_min' and 'y_max' set
+        """
+        if self._bounding_box is None:
+            self._bounding_box = self.bounding_box(settings=self.settings)
+        return self._bounding_box
+
     def render_to_page(self, page: GraphicsPage, offset_x: float = 0, offset_y: float = 0, rotation: float = 0) -> None:
         """
         Render this component onto a Page object.
 
+        This is the only place where a GraphicsContext is created: one per page, at the top of the
+        component tree. Sub-components of a composite must be drawn by passing this context down through
+        <do_rendering>, never by calling <render_to_page> recursively, so that the cairo context and its
+        transformation matrix are set up exactly once per page.
+
         :param page:
-            The GraphicsPage we are going to draw onto
+            The GraphicsPage we are going to draw onto. Must be a GraphicsPage instance; the type
+            annotation is authoritative, and anything else will fail as soon as we open a drawing context.
         :param offset_x:
             The offset of this drawing from (0,0) on the page, metres
         :param offset_y:
@@ -663,9 +1067,6 @@ class BaseComponent:
             The rotation of this drawing, float
         """
 
-        # Make sure that the page we're going to draw onto is of the correct type
-        assert isinstance(page, GraphicsPage)
-
         # Create a drawing context for drawing onto this page
         with GraphicsContext(page=page, offset_x=offset_x, offset_y=offset_y, rotation=rotation) as context:
             # Render this item
@@ -689,7 +1090,7 @@ class BaseComponent:
         """
 
         # Look up the bounding box of the item we're about to draw
-        bounding_box: Dict[str, float] = self.bounding_box(settings=self.settings)
+        bounding_box: Dict[str, float] = self.get_bounding_box()
 
         # If no filename is specified, then individual derived classes should specify a default
         if filename is None:
@@ -706,7 +1107,8 @@ class BaseComponent:
                                 offset_x=-bounding_box['x_min'],
                                 offset_y=-bounding_box['y_min'])
 
-    def render_all_formats(self, filename: Optional[str] = None, dots_per_inch: float = dots_per_inch) -> None:
+    def render_all_formats(self, filename: Optional[str] = None, dots_per_inch: float = dots_per_inch,
+                           formats: Optional[Sequence[str]] = None) -> None:
         """
         Quick shortcut to render this component in all the standard image formats.
 
@@ -716,16 +1118,67 @@ class BaseComponent:
             The dots per inch resolution to render this page
         :type dots_per_inch:
             float
+        :param formats:
+            The image formats to produce. Defaults to all the formats supported by <GraphicsPage>.
         :return:
             None
         """
 
-        # Produce each image format in turn
-        for img_format in GraphicsPage.supported_formats():
-            # Render the item
-            self.render_to_file(filename=filename,
-                                img_format=img_format,
-                                dots_per_inch=dots_per_inch)
+        if formats is None:
+            formats = GraphicsPage.supported_formats()
+
+        # If no filename is specified, then individual derived classes should specify a default
+        if filename is None:
+            filename = self.default_filename()
+
+        # If Ghostscript is available, produce the PNG output by rasterizing the PDF output, rather than
+        # having cairo re-render the whole scene onto a bitmap surface
+        png_via_ghostscript: bool = (("png" in formats) and ("pdf" in formats) and
+                                     (shutil.which("gs") is not None))
+
+        # Look up the bounding box of the item we're about to draw
+        bounding_box: Dict[str, float] = self.get_bounding_box()
+        width: float = bounding_box['x_max'] - bounding_box['x_min']
+        height: float = bounding_box['y_max'] - bounding_box['y_min']
+
+        # Run <do_rendering> once, recording the vector drawing commands into an off-screen surface
+        recording_page: GraphicsPage = GraphicsPage(img_format="recording", output=filename,
+                                                    width=width, height=height)
+        self.render_to_page(page=recording_page,
+                            offset_x=-bounding_box['x_min'],
+                            offset_y=-bounding_box['y_min'])
+
+        # Replay the recorded drawing onto each target surface in turn
+        gs_process: Optional[subprocess.Popen] = None
+        for img_format in formats:
+            if (img_format == "png") and png_via_ghostscript:
+                continue
+            with GraphicsPage(img_format=img_format, output=filename,
+                              width=width, height=height,
+                              dots_per_inch=dots_per_inch) as page:
+                replay_context: cairo.Context = cairo.Context(target=page.surface)
+                scaling: float = page.dots_per_metre / recording_page.dots_per_metre
+                replay_context.scale(sx=scaling, sy=scaling)
+                replay_context.set_source_surface(surface=recording_page.surface, x=0, y=0)
+                replay_context.paint()
+
+            # As soon as the PDF is on disk, start rasterizing it to PNG in a background process, so the
+            # Deflate-bound PNG encode overlaps with the replay of the remaining formats
+            if (img_format == "pdf") and png_via_ghostscript:
+                gs_process = subprocess.Popen(["gs", "-dQUIET", "-dBATCH", "-dNOPAUSE",
+                                               "-sDEVICE=pngalpha",
+                                               "-r{:.0f}".format(dots_per_inch),
+                                               "-sOutputFile={}.png".format(filename),
+                                               "{}.pdf".format(filename)])
+
+        # Discard the recording surface now that every output format has been written
+        recording_page.close()
+
+        # Wait for the background PNG rasterization to complete before returning
+        if gs_process is not None:
+            return_code: int = gs_process.wait()
+            if return_code != 0:
+                raise subprocess.CalledProcessError(return_code, gs_process.args)
 
     def bounding_box(self, settings: dict) -> Dict[str, float]:
         """
@@ -764,10 +1217,28 @@ class BaseComponent:
         raise NotImplementedError("Derived classes of type <BaseComponent> must implement a method <do_rendering> "
                                   "to draw the component.")
 
+    def emit_paths(self, context: GraphicsContext) -> Optional[Sequence[Tuple[tuple, callable]]]:
+        """
+        Optionally expose this component's drawing as a list of uniformly-styled paths, so that a
+        <CompositeComponent> can concatenate paths which share a style and stroke them in one go, rather
+        than re-rendering each component separately.
+
+        Each entry is a tuple of a style key -- (line_width, dotted, color) as passed to <stroke> -- and a
+        callable which adds the component's sub-paths to the supplied drawing context.
+
+        :param context:
+            A GraphicsContext object which the paths will later be drawn onto
+        :return:
+            A list of (style_key, path_builder) tuples, or None if this component can only draw itself via
+            <do_rendering>
+        """
+        return None
+
 
 class CompositeComponent(BaseComponent):
     """
-    A class allowing multiple components to be overlaid on a single canvas
+    A class allowing multiple components to be overlaid on a single canvas. All the sub-components share
+    the drawing context created for the page; none of them sets up a cairo context of its own.
     """
 
     def __init__(self, components: Sequence[BaseComponent], settings: Optional[dict] = None):
@@ -781,24 +1252,42 @@ class CompositeComponent(BaseComponent):
         """
         Work out overall bounding box of all items when constituent components are overlaid.
 
+        The result is aggregated in a single pass over the sub-components, and cached: with nested
+        composites, each sub-component may compute its own bounding box expensively, and the overall box is
+        queried both when sizing the page and when positioning the rendering on it.
+
         :param settings:
             A dictionary of settings required by the renderer.
         """
 
-        bounding_boxes: Sequence[Dict[str, float]] = [item.bounding_box(settings=item.settings)
-                                                      for item in self.components]
+        if self._bounding_box is None:
+            x_min = y_min = float('inf')
+            x_max = y_max = float('-inf')
+            for item in self.components:
+                item_box: Dict[str, float] = item.get_bounding_box()
+                x_min = min(x_min, item_box['x_min'])
+                x_max = max(x_max, item_box['x_max'])
+                y_min = min(y_min, item_box['y_min'])
+                y_max = max(y_max, item_box['y_max'])
 
-        return {
-            'x_min': min([item['x_min'] for item in bounding_boxes]),
-            'x_max': max([item['x_max'] for item in bounding_boxes]),
-            'y_min': min([item['y_min'] for item in bounding_boxes]),
-            'y_max': max([item['y_max'] for item in bounding_boxes]),
-        }
+            self._bounding_box = {
+                'x_min': x_min,
+                'x_max': x_max,
+                'y_min': y_min,
+                'y_max': y_max,
+            }
+
+        return self._bounding_box
 
     def do_rendering(self, settings: dict, context: GraphicsContext) -> None:
         """
         Render each of the subcomponents we are overlaying in turn.
 
+        Sub-components which expose their drawing through <emit_paths> are bucketed by style, and all the
+        paths which share a style are concatenated and stroked in a single call; everything else falls back
+        to its own <do_rendering> pass. Batched paths are stroked after the un-batched components, so mixed
+        overlays should only opt in where the stacking order does not matter.
+
         :param settings:
             A dictionary of settings required by the renderer.
         :param context:
@@ -807,5 +1296,19 @@ class CompositeComponent(BaseComponent):
             None
         """
 
+        path_batches: Dict[tuple, list] = {}
+
         for item in self.components:
-            item.do_rendering(settings=settings, context=context)
+            paths: Optional[Sequence[Tuple[tuple, callable]]] = item.emit_paths(context=context)
+            if paths is None:
+                item.do_rendering(settings=settings, context=context)
+                continue
+            for style_key, path_builder in paths:
+                path_batches.setdefault(style_key, []).append(path_builder)
+
+        # One stroke per distinct style, regardless of how many components contributed paths to it
+        for (line_width, dotted, color), path_builders in path_batches.items():
+            context.begin_path()
+            for path_builder in path_builders:
+                path_builder(context)
+            context.stroke(line_width=line_width, dotted=dotted, color=color)
@@ -19,11 +19,11 @@
 
 # Delete any previous output from running this script
 rm -Rf __pycache__ *.pyc output
-rm -Rf doc/*.aux doc/*.dvi doc/*.log doc/*.pdf doc/*.ps doc/tmp doc/*.out
+rm -Rf doc/*.aux doc/*.dvi doc/*.log doc/*.pdf doc/*.ps doc/*.fmt doc/tmp doc/tmp_* doc/*.out
 
 # Run the python 3 script which generates astrolabe models for a wide range of latitudes
 python3 astrolabe.py $@
 
 # Clean up temporary files which get made along the way
 rm -Rf __pycache__ *.pyc
-rm -Rf doc/*.aux doc/*.dvi doc/*.log doc/*.pdf doc/*.ps doc/tmp doc/*.out
+rm -Rf doc/*.aux doc/*.dvi doc/*.log doc/*.pdf doc/*.ps doc/*.fmt doc/tmp doc/tmp_* doc/*.out
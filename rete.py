@@ -22,10 +22,12 @@ Render the rete of the astrolabe.
 """
 
 from math import pi, sin, tan, cos, asin, floor
-from typing import Dict
+from typing import Dict, Union
 
+import numpy as np
 from bright_stars_process import fetch_bright_star_list
 from constants import unit_deg, unit_rev, unit_mm, inclination_ecliptic, centre_scaling, r_1, d_12, line_width_base
+from geom_kernels import project_stereographic
 from graphics_context import BaseComponent, GraphicsContext
 from numpy import arange
 from settings import fetch_command_line_arguments
@@ -193,7 +195,10 @@ class Rete(BaseComponent):
         context.circle(centre_x=0, centre_y=0, radius=r_5)
         context.stroke()
 
-        # Draw constellation stick figures
+        # Draw constellation stick figures. The stroke endpoints are first parsed into arrays -- two
+        # consecutive entries per stroke -- and then projected onto the rete in a single vectorized pass.
+        stick_ra: list = []
+        stick_dec: list = []
         with open("raw_data/constellation_stick_figures.dat") as f_in:
             for line in f_in:
                 line: str = line.strip()
@@ -211,62 +216,62 @@ class Rete(BaseComponent):
                 dec2_str: str
                 name, ra1_str, dec1_str, ra2_str, dec2_str = line.split()
 
-                dec1: float = float(dec1_str)
-                ra1: float = float(ra1_str)
-                dec2: float = float(dec2_str)
-                ra2: float = float(ra2_str)
-
-                # In the southern hemisphere, we flip the sky upside down
-                if is_southern:
-                    dec1 *= -1
-                    ra1 *= -1
-                    dec2 *= -1
-                    ra2 *= -1
-
-                # Convert start and end of line into a radius and an azimuth
-                theta_point_1: float = (90 - float(dec1)) * unit_deg / 2
-                r_point_1: float = r_4 * tan(theta_point_1)
-                if r_point_1 > r_2:
-                    continue
+                stick_ra.append(float(ra1_str))
+                stick_dec.append(float(dec1_str))
+                stick_ra.append(float(ra2_str))
+                stick_dec.append(float(dec2_str))
 
-                theta_point_2: float = (90 - float(dec2)) * unit_deg / 2
-                r_point_2: float = r_4 * tan(theta_point_2)
-                if r_point_2 > r_2:
-                    continue
+        stick_ra_arr: np.ndarray = np.array(stick_ra)
+        stick_dec_arr: np.ndarray = np.array(stick_dec)
 
-                # Draw stick figure line
-                context.begin_path()
-                context.move_to(x=r_point_1 * cos(float(ra1) * unit_deg), y=-r_point_1 * sin(float(ra1) * unit_deg))
-                context.line_to(x=r_point_2 * cos(float(ra2) * unit_deg), y=-r_point_2 * sin(float(ra2) * unit_deg))
-                context.stroke(dotted=True, line_width=1, color=theme['stick_figures'])
+        # In the southern hemisphere, we flip the sky upside down
+        if is_southern:
+            stick_ra_arr = -stick_ra_arr
+            stick_dec_arr = -stick_dec_arr
 
-        # Draw stars from Yale Bright Star Catalogue
-        for star_descriptor in fetch_bright_star_list()['stars'].values():
-            ra, dec, mag = star_descriptor[:3]
+        # Convert the ends of each stroke into positions on the rete
+        stick_r: np.ndarray
+        stick_x: np.ndarray
+        stick_y: np.ndarray
+        stick_r, stick_x, stick_y = project_stereographic(ra=stick_ra_arr, dec=stick_dec_arr, r_4=r_4)
 
-            # Discard stars fainter than mag 4
-            if mag == "-" or float(mag) > 4.0:
+        for index in range(0, stick_r.size, 2):
+            # Reject strokes with either end outside the plotted area
+            if (stick_r[index] > r_2) or (stick_r[index + 1] > r_2):
                 continue
 
-            # In the southern hemisphere, we flip the sky upside down
-            ra = float(ra)
-            dec = float(dec)
-            if is_southern:
-                dec *= -1
-                ra *= -1
+            # Draw stick figure line
+            context.begin_path()
+            context.move_to(x=stick_x[index], y=stick_y[index])
+            context.line_to(x=stick_x[index + 1], y=stick_y[index + 1])
+            context.stroke(dotted=True, line_width=1, color=theme['stick_figures'])
 
-            theta: float = (90 - dec) * unit_deg / 2
-            r: float = r_4 * tan(theta)
+        # Draw stars from Yale Bright Star Catalogue. The projection from (RA, Dec) onto the rete is
+        # computed over the whole catalog at once, as vectorized operations on the catalog's columns.
+        star_catalog: Dict[str, Union[list, dict]] = fetch_bright_star_list()
+        star_ra: np.ndarray = star_catalog['ra']
+        star_dec: np.ndarray = star_catalog['dec']
+        star_mag: np.ndarray = star_catalog['mag']
 
-            # Discard stars which are outside the plotted area
-            if r > r_2:
-                continue
+        # In the southern hemisphere, we flip the sky upside down
+        if is_southern:
+            star_ra = -star_ra
+            star_dec = -star_dec
 
-            # Draw a circle to represent this star
-            context.begin_path()
-            context.circle(centre_x=r * cos(ra * unit_deg), centre_y=-r * sin(ra * unit_deg),
-                           radius=0.18 * unit_mm * (5 - mag))
-            context.fill(color=theme['lines'])
+        star_r: np.ndarray
+        star_x: np.ndarray
+        star_y: np.ndarray
+        star_r, star_x, star_y = project_stereographic(ra=star_ra, dec=star_dec, r_4=r_4)
+
+        # Discard stars fainter than mag 4, and stars which are outside the plotted area
+        star_visible: np.ndarray = (star_mag <= 4.0) & (star_r <= r_2)
+
+        star_radius: np.ndarray = 0.18 * unit_mm * (5 - star_mag)
+
+        # Draw a circle to represent each star, batching all the markers into a single path and fill
+        visible: np.ndarray = np.flatnonzero(star_visible)
+        context.draw_markers(xs=star_x[visible], ys=star_y[visible],
+                             radii=star_radius[visible], color=theme['lines'])
 
         # Draw RA scale around the edge of the rete
         r_tick: float = r_2 * 0.98
@@ -283,14 +288,12 @@ class Rete(BaseComponent):
                          x=r_tick * cos(theta), y=-r_tick * sin(theta),
                          h_align=0, v_align=-1, gap=unit_mm, rotation=-pi / 2 - theta)
 
-        # Draw six small tick marks within each hour of RA
+        # Draw six small tick marks within each hour of RA, as a single batched ring of ticks
         r_tick: float = r_2 * 0.99
-        for ra in arange(0, 23.9, 1. / 6):
-            theta: float = ra / 24 * unit_rev
-            context.begin_path()
-            context.move_to(x=r_2 * cos(theta), y=r_2 * sin(theta))
-            context.line_to(x=r_tick * cos(theta), y=r_tick * sin(theta))
-            context.stroke()
+        context.begin_path()
+        context.radial_ticks(centre_x=0, centre_y=0, r_inner=r_tick, r_outer=r_2,
+                             angles=arange(0, 23.9, 1. / 6) / 24 * unit_rev)
+        context.stroke()
 
 
 # Do it right away if we're run as a script